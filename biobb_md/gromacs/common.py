@@ -1,15 +1,92 @@
 """ Common functions for package biobb_md.gromacs """
+import os
 import re
+import json
+import stat
+import shlex
+import shutil
+import subprocess
+import threading
+import zipfile
+import itertools
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 from biobb_common.tools import file_utils as fu
 from biobb_common.command_wrapper import cmd_wrapper
-from typing import List, Dict, Tuple, Mapping, Union, Set, Sequence
+from typing import List, Dict, Tuple, Mapping, Union, Set, Sequence, Iterable, Optional, Callable
+
+
+# GROMACS versions already detected in this process, by gmx path
+_GMX_VERSION_CACHE: Dict[str, int] = {}
+
+
+def _gmx_binary_key(gmx: str) -> Optional[str]:
+    """ Returns the key of the GROMACS binary in the on-disk version cache:
+    its resolved path and modification time, so rebuilding or replacing the
+    binary invalidates the cached version. None if it can not be resolved."""
+    tokens = gmx.split()
+    binary = shutil.which(tokens[0]) if tokens else None
+    if not binary:
+        return None
+    binary = os.path.realpath(binary)
+    try:
+        return "%s:%d" % (binary, os.stat(binary).st_mtime_ns)
+    except OSError:
+        return None
+
+
+def _version_cache_file() -> Optional[Path]:
+    """ Returns the file of the on-disk version cache, holding the GROMACS versions
+    detected by previous processes. Resolved on each call, so importing the module
+    never depends on HOME. None if the BIOBB_MD_NO_VERSION_DISK_CACHE environment
+    variable is set or no cache directory can be determined."""
+    if os.environ.get('BIOBB_MD_NO_VERSION_DISK_CACHE'):
+        return None
+    try:
+        cache_dir = os.environ.get('XDG_CACHE_HOME') or Path.home().joinpath('.cache')
+    except (RuntimeError, KeyError, OSError):
+        return None
+    return Path(cache_dir).joinpath('biobb_md', 'gmx_version.json')
+
+
+def _read_version_cache() -> Dict[str, int]:
+    cache_file_path = _version_cache_file()
+    if not cache_file_path:
+        return {}
+    try:
+        with open(cache_file_path) as cache_file:
+            cache = json.load(cache_file)
+        return cache if isinstance(cache, dict) else {}
+    except (OSError, RuntimeError, ValueError):
+        return {}
+
+
+def _write_version_cache(key: str, version: int) -> None:
+    cache_file_path = _version_cache_file()
+    if not cache_file_path:
+        return
+    cache = _read_version_cache()
+    cache[key] = version
+    tmp_file = cache_file_path.with_name("%s.%d" % (cache_file_path.name, os.getpid()))
+    try:
+        cache_file_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(tmp_file, 'w') as cache_file:
+            json.dump(cache, cache_file)
+        os.replace(tmp_file, cache_file_path)
+    except (OSError, RuntimeError):
+        pass
 
 
 def get_gromacs_version(gmx: str = "gmx") -> int:
     """ Gets the GROMACS installed version and returns it as an int(3) for
     versions older than 5.1.5 and an int(5) for 20XX versions filling the gaps
-    with '0' digits.
+    with '0' digits. Detected versions are cached per gmx path, ignoring the
+    -nobackup and -nocopyright options, for the lifetime of the process, and on disk per binary path and modification
+    time so later processes of the same workflow skip the subprocess. Setting
+    the BIOBB_MD_NO_VERSION_CACHE environment variable forces a new detection
+    that refreshes both caches, BIOBB_MD_NO_VERSION_DISK_CACHE turns off only
+    the on-disk one.
 
     Args:
         gmx (str): ('gmx') Path to the GROMACS binary.
@@ -17,6 +94,17 @@ def get_gromacs_version(gmx: str = "gmx") -> int:
     Returns:
         int: GROMACS version.
     """
+    use_cache = not os.environ.get('BIOBB_MD_NO_VERSION_CACHE')
+    # The same binary called with different global options shares the entry
+    gmx_key = " ".join(token for token in gmx.split() if token not in ('-nobackup', '-nocopyright'))
+    if use_cache and gmx_key in _GMX_VERSION_CACHE:
+        return _GMX_VERSION_CACHE[gmx_key]
+    binary_key = _gmx_binary_key(gmx)
+    if use_cache and binary_key:
+        cached_version = _read_version_cache().get(binary_key)
+        if isinstance(cached_version, int) and cached_version:
+            _GMX_VERSION_CACHE[gmx_key] = cached_version
+            return cached_version
     unique_dir = fu.create_unique_dir()
     out_log, err_log = fu.get_logs(path=unique_dir, can_write_console=False)
     cmd = [gmx, "-version"]
@@ -40,7 +128,487 @@ def get_gromacs_version(gmx: str = "gmx") -> int:
             version += '0'
 
     fu.rm(unique_dir)
-    return int(version)
+    _GMX_VERSION_CACHE[gmx_key] = int(version)
+    if binary_key and _GMX_VERSION_CACHE[gmx_key]:
+        _write_version_cache(binary_key, _GMX_VERSION_CACHE[gmx_key])
+    return _GMX_VERSION_CACHE[gmx_key]
+
+
+def gmx_cmd_tokens(gmx_path: str, nobackup: bool = True, nocopyright: bool = True) -> List[str]:
+    """ Splits the **gmx_path** property into argv tokens and adds the enabled
+    GROMACS global options, ready to start a command line exec'ed without a shell.
+
+    Args:
+        gmx_path (str): Path to the GROMACS executable binary, optionally with arguments.
+        nobackup (bool): (True) Add the -nobackup global option.
+        nocopyright (bool): (True) Add the -nocopyright global option.
+
+    Returns:
+        list: gmx executable and global options.
+    """
+    return shlex.split(gmx_path) + (['-nobackup'] if nobackup else []) + (['-nocopyright'] if nocopyright else [])
+
+
+# Characters the container command line needs quoted, as in shlex.quote
+_UNSAFE_ARG = re.compile(r'[^\w@%+=:,./-]', re.ASCII)
+# Characters still special inside the double quotes biobb_common wraps the container command with
+_DOUBLE_QUOTE_SPECIAL = re.compile(r'([\\"$`])')
+
+
+def quote_container_arg(arg: str) -> str:
+    """ Quotes an argument of a container command line. biobb_common joins the
+    command and runs it as ``<container_shell_path> -c "<command>"``, so the
+    argument is single quoted for the container shell and then escaped for the
+    enclosing double quotes parsed by the host shell.
+
+    Args:
+        arg (str): Command line argument.
+
+    Returns:
+        str: Argument ready to be joined into the container command line.
+    """
+    if arg and not _UNSAFE_ARG.search(arg):
+        return arg
+    return _DOUBLE_QUOTE_SPECIAL.sub(r'\\\1', "'" + arg.replace("'", "'\\''") + "'")
+
+
+# mdrun log messages of a run stopped before its last step, by -maxh or by a signal
+_MDRUN_STOPPED = re.compile(rb'Run time exceeded|Received the \w+ signal')
+
+
+def mdrun_log_finished(log_path: str, tail_bytes: int = 1 << 20) -> bool:
+    """ Checks in the last **tail_bytes** of the mdrun log whether the last
+    run reached its final step: it printed "Finished mdrun" and was not
+    stopped before by -maxh or a signal. Runs continued with -append start
+    a new "Started mdrun" section in the same log.
+
+    Args:
+        log_path (str): Path to the mdrun LOG file.
+        tail_bytes (int): (1048576) Number of bytes read from the end of the log.
+
+    Returns:
+        bool: True if the run is finished, False if it is unfinished or the log can not be read.
+    """
+    try:
+        with open(log_path, 'rb') as log_file:
+            log_file.seek(0, os.SEEK_END)
+            log_file.seek(max(0, log_file.tell() - tail_bytes))
+            tail = log_file.read()
+    except OSError:
+        return False
+    finished_at = tail.rfind(b'Finished mdrun')
+    if finished_at < 0:
+        return False
+    started_at = tail.rfind(b'Started mdrun', 0, finished_at)
+    return not _MDRUN_STOPPED.search(tail, max(started_at, 0), finished_at)
+
+
+def fspath_io_dict(io_dict: Dict[str, Dict]) -> Dict[str, Dict]:
+    """ Converts once the path-like objects (ie pathlib.Path) of an IO dictionary
+    to plain strings, so the staging, restart and command line code always
+    works with str paths.
+
+    Args:
+        io_dict (dict): IO dictionary with the 'in' and 'out' keys.
+
+    Returns:
+        dict: The same IO dictionary, modified in place.
+    """
+    for io_paths in io_dict.values():
+        for file_ref, file_path in io_paths.items():
+            if file_path is not None and not isinstance(file_path, str):
+                io_paths[file_ref] = os.fspath(file_path)
+    return io_dict
+
+
+def check_input_files(*paths: str) -> None:
+    """ Checks that the input files exist and are not empty before launching
+    GROMACS, so misconfigured steps fail without spawning any process.
+
+    Args:
+        *paths (str): Paths to the input files.
+
+    Raises:
+        FileNotFoundError: If an input file does not exist.
+        ValueError: If an input file is empty.
+    """
+    for path in paths:
+        if os.stat(path).st_size == 0:
+            raise ValueError(f"Input file {path} is empty")
+
+
+def check_complete_files(output_file_list: Iterable[str]) -> bool:
+    """ Checks that all the output files exist and are not empty. Each parent
+    directory holding several outputs is read once with os.scandir and only
+    the entries of the requested files are stat'ed, so missing files cost no
+    syscall at all. A lone output is stat'ed directly, which is cheaper than
+    listing a large directory.
+
+    Args:
+        output_file_list (list): Paths to the output files, None values are ignored.
+
+    Returns:
+        bool: True if all the files exist and are not empty.
+    """
+    files_by_dir: Dict[str, Set[str]] = {}
+    for file_path in filter(None, output_file_list):
+        file_path = os.path.abspath(file_path)
+        files_by_dir.setdefault(os.path.dirname(file_path), set()).add(os.path.basename(file_path))
+    for dir_path, file_names in files_by_dir.items():
+        if len(file_names) == 1:
+            try:
+                file_stat = os.stat(os.path.join(dir_path, next(iter(file_names))))
+            except OSError:
+                return False
+            if not stat.S_ISREG(file_stat.st_mode) or not file_stat.st_size:
+                return False
+            continue
+        try:
+            with os.scandir(dir_path) as entries:
+                complete = {entry.name for entry in entries
+                            if entry.name in file_names and entry.is_file() and entry.stat().st_size > 0}
+        except OSError:
+            return False
+        if complete != file_names:
+            return False
+    return True
+
+
+def stage_to_container(io_dict: Mapping, container_volume_path: str, out_log=None) -> Dict:
+    """ Stages the input files in a new unique directory to be mounted as the
+    container volume, like biobb_common BiobbObject.stage_files, but hard
+    linking them instead of copying when the directory is in the same
+    filesystem. GROMACS only reads the inputs, so sharing the inode is safe.
+
+    Args:
+        io_dict (dict): Host IO dictionary.
+        container_volume_path (str): Path of the volume inside the container.
+        out_log (logger): (None) Python logger object.
+
+    Returns:
+        dict: Staged IO dictionary with the 'unique_dir' key.
+    """
+    unique_dir = str(Path(fu.create_unique_dir()).resolve())
+    stage_io_dict = {"in": {}, "out": {}, "unique_dir": unique_dir}
+    for file_ref, file_path in io_dict["in"].items():
+        if file_path:
+            if os.path.exists(file_path):
+                staged_file_path = os.path.join(unique_dir, os.path.basename(file_path))
+                try:
+                    os.link(file_path, staged_file_path)
+                    fu.log(f'Link: {file_path} to {unique_dir}', out_log)
+                except OSError:
+                    shutil.copy2(file_path, staged_file_path)
+                    fu.log(f'Copy: {file_path} to {unique_dir}', out_log)
+                stage_io_dict["in"][file_ref] = str(Path(container_volume_path).joinpath(Path(file_path).name))
+            else:
+                # Default files in GMXLIB path
+                stage_io_dict["in"][file_ref] = file_path
+    for file_ref, file_path in io_dict["out"].items():
+        if file_path:
+            stage_io_dict["out"][file_ref] = str(Path(container_volume_path).joinpath(Path(file_path).name))
+    return stage_io_dict
+
+
+def move_to_host(stage_io_dict: Mapping, io_dict: Mapping) -> List[str]:
+    """ Moves the output files written in the container staging directory to
+    their host paths. A rename is used when both paths are in the same
+    filesystem, falling back to a copy otherwise.
+
+    Args:
+        stage_io_dict (dict): Staged IO dictionary with the 'unique_dir' key.
+        io_dict (dict): Host IO dictionary.
+
+    Returns:
+        list: Host paths of the moved files.
+    """
+    moved_files = []
+    for file_ref, file_path in stage_io_dict["out"].items():
+        if file_path:
+            staged_file_path = os.path.join(stage_io_dict["unique_dir"], os.path.basename(file_path))
+            if os.path.exists(staged_file_path):
+                host_file_path = io_dict["out"][file_ref]
+                try:
+                    os.replace(staged_file_path, host_file_path)
+                except OSError:
+                    shutil.copy2(staged_file_path, host_file_path)
+                moved_files.append(host_file_path)
+    return moved_files
+
+
+def rm_file_list(file_list: Iterable[str], out_log=None) -> List[str]:
+    """ Removes files and directories without checking their existence
+    first: each path is unlinked directly and directories are removed
+    with :func:`shutil.rmtree`, so a missing path costs a single syscall.
+    As in :func:`biobb_common.tools.file_utils.rm_file_list` a path that
+    can not be removed is logged and skipped, it never raises.
+
+    Args:
+        file_list (list): Paths of the files and directories to remove.
+        out_log (logger): Log object.
+
+    Returns:
+        list: Paths actually removed.
+    """
+    removed_files = []
+    for file_path in filter(None, file_list):
+        try:
+            try:
+                os.unlink(file_path)
+            except (IsADirectoryError, PermissionError):
+                if not os.path.isdir(file_path):
+                    raise
+                shutil.rmtree(file_path)
+        except FileNotFoundError:
+            continue
+        except OSError as error:
+            fu.log('Could not remove %s: %s' % (file_path, error), out_log)
+            continue
+        removed_files.append(file_path)
+    if out_log:
+        fu.log('Removed: %s' % str(removed_files), out_log)
+    return removed_files
+
+
+def _run_job(building_block: Callable[..., int], job: Mapping) -> int:
+    return building_block(**job)
+
+
+def run_many(building_block: Callable[..., int], jobs: Iterable[Mapping], n_workers: int = None) -> List[int]:
+    """ Runs many independent jobs of a **building_block** function (ie pdb2gmx)
+    in a pool of **n_workers** processes (os.cpu_count() by default). Each job
+    is a dict with the building block arguments. A job without its own step
+    gets its index as step, so the logs and intermediate files of concurrent
+    jobs never collide. Each GROMACS binary is detected once here and the
+    workers find it in the version cache.
+
+    Args:
+        building_block (function): Module level building block function, it has to be picklable.
+        jobs (list): Arguments of each job.
+        n_workers (int): Number of worker processes.
+
+    Returns:
+        list: Return codes of the jobs, in the same order.
+    """
+    jobs = [{**job, 'properties': {'step': str(index), **(job.get('properties') or {})}}
+            for index, job in enumerate(jobs)]
+    for gmx_path in {job['properties'].get('gmx_path', 'gmx') for job in jobs if not job['properties'].get('container_path')}:
+        get_gromacs_version(gmx_path)
+    with ProcessPoolExecutor(max_workers=n_workers) as executor:
+        return list(executor.map(_run_job, itertools.repeat(building_block), jobs))
+
+
+_ZIP_COMPRESSION = {'deflate': zipfile.ZIP_DEFLATED, 'stored': zipfile.ZIP_STORED}
+
+
+def zip_top(zip_file: str, top_file: str, out_log=None, compresslevel: int = 1,
+            compression_method: str = 'deflate') -> List[str]:
+    """ Compresses the **top_file** topology and the itp files it includes into
+    **zip_file**. Same archive layout as biobb_common file_utils.zip_top, but
+    deflated with a fast compression level: topology text shrinks several
+    times, so far fewer bytes reach the (usually shared) file system. Each file
+    is streamed into the archive in a single pass by ZipFile.write.
+
+    Args:
+        zip_file (str): Output compressed zip file.
+        top_file (str): Topology TOP GROMACS file.
+        out_log (logger): (None) Python logger object.
+        compresslevel (int): (1) Deflate compression level from 1 (fastest) to 9 (smallest).
+        compression_method (str): ("deflate") Zip compression method: deflate or stored (uncompressed).
+
+    Returns:
+        list: Paths of the compressed files.
+    """
+    file_list = sorted(fu.search_topology_files(top_file, out_log))
+    inserted = set()
+    with zipfile.ZipFile(zip_file, 'w', compression=_ZIP_COMPRESSION[compression_method],
+                         compresslevel=compresslevel) as zip_f:
+        for index, file_path in enumerate(file_list):
+            base_name = os.path.basename(file_path)
+            if base_name in inserted:
+                base_name = 'file_' + str(index) + '_' + base_name
+            inserted.add(base_name)
+            zip_f.write(file_path, arcname=base_name)
+    if out_log:
+        out_log.info("Adding:")
+        out_log.info(str(file_list))
+        out_log.info("to: " + str(Path(zip_file).resolve()))
+    return file_list
+
+
+def extract_top(zip_file: str, dest_dir: str, out_log=None) -> str:
+    """ Extracts only the ".top" file of the **zip_file** topology into
+    **dest_dir**, for tools like gmx solvate that edit the top file without
+    reading the itp files it includes.
+
+    Args:
+        zip_file (str): Input topology zipball file path.
+        dest_dir (str): Directory where the top file is extracted.
+        out_log (logger): (None) Python logger object.
+
+    Returns:
+        str: Path to the extracted ".top" file.
+    """
+    with zipfile.ZipFile(zip_file) as zip_f:
+        top_name = next(name for name in zip_f.namelist() if name.endswith(".top"))
+        top_file = zip_f.extract(top_name, dest_dir)
+    if out_log:
+        out_log.info("Unzipping: " + top_name)
+        out_log.info("From: " + str(zip_file))
+        out_log.info("To: " + top_file)
+    return top_file
+
+
+def update_top_zip(input_zip_file: str, output_zip_file: str, top_file: str, out_log=None,
+                   compresslevel: int = 1) -> List[str]:
+    """ Writes **output_zip_file** with the members of **input_zip_file**,
+    replacing its ".top" member by **top_file**. The other members are
+    streamed from one archive to the other without being extracted to disk.
+
+    Args:
+        input_zip_file (str): Input topology zipball file path.
+        output_zip_file (str): Output topology zipball file path.
+        top_file (str): Updated topology TOP GROMACS file.
+        out_log (logger): (None) Python logger object.
+        compresslevel (int): (1) Deflate compression level from 1 (fastest) to 9 (smallest).
+
+    Returns:
+        list: Names of the members in the output zip file.
+    """
+    with zipfile.ZipFile(input_zip_file) as zip_in, \
+            zipfile.ZipFile(output_zip_file, 'w', compression=zipfile.ZIP_DEFLATED, compresslevel=compresslevel) as zip_out:
+        names = zip_in.namelist()
+        top_name = next(name for name in names if name.endswith(".top"))
+        for name in names:
+            if name == top_name:
+                zip_out.write(top_file, arcname=top_name)
+            else:
+                with zip_in.open(name) as member_in, zip_out.open(name, 'w') as member_out:
+                    shutil.copyfileobj(member_in, member_out, 1 << 20)
+    if out_log:
+        out_log.info("Updating: " + top_name)
+        out_log.info("From: " + str(input_zip_file))
+        out_log.info("To: " + str(Path(output_zip_file).resolve()))
+    return names
+
+
+# Line ends of the gmx output, \r included for the progress rewritten in place
+_LINE_END = re.compile(rb'\r\n|\r|\n')
+
+
+class GmxCmdWrapper(cmd_wrapper.CmdWrapper):
+    """ Command line wrapper that streams the process stdout and stderr to the
+    logs while the process runs, one log record per chunk read. Only the last
+    **tail_lines** lines of each stream are kept in memory instead of the whole
+    output. Carriage returns end a line too, so the progress that mdrun -v
+    rewrites in place does not accumulate, and a line longer than
+    **max_line_bytes** is split.
+
+    Args:
+        cmd (list): Command line as a list of strings.
+        out_log (logger): (None) Python logger object for the stdout.
+        err_log (logger): (None) Python logger object for the stderr.
+        global_log (logger): (None) Python logger object for the global log.
+        env (dict): (None) Environment of the process, os.environ copy by default.
+        tail_lines (int): (1024) Number of lines of each stream kept in memory.
+        shell (bool): (True) Run the command through the shell. If False **cmd** must be the exact argv of the process.
+        bufsize (int): (-1) Buffer size of the stdout and stderr pipes, -1 for the io.DEFAULT_BUFFER_SIZE.
+        stdin_bytes (bytes): (None) Data written to the process stdin, instead of piping it from an echo command.
+        max_line_bytes (int): (65536) Maximum length of a line kept in memory.
+    """
+
+    def __init__(self, cmd: Sequence[str], out_log=None, err_log=None, global_log=None,
+                 env: Mapping[str, str] = None, tail_lines: int = 1024, shell: bool = True, bufsize: int = -1,
+                 stdin_bytes: bytes = None, max_line_bytes: int = 65536) -> None:
+        super().__init__(cmd, out_log, err_log, global_log, env)
+        self.shell = shell
+        self.bufsize = bufsize
+        self.stdin_bytes = stdin_bytes
+        self.max_line_bytes = max_line_bytes
+        self.stdout_tail = deque(maxlen=tail_lines)
+        self.stderr_tail = deque(maxlen=tail_lines)
+
+    def _drain(self, stream, log, tail: deque) -> None:
+        pending = b''
+        with stream:
+            while True:
+                chunk = os.read(stream.fileno(), 1 << 16)
+                if chunk:
+                    raw_lines = _LINE_END.split(pending + chunk)
+                    pending = raw_lines.pop()
+                    # Bound the unfinished line, a stream without line ends must not grow it forever
+                    while len(pending) > self.max_line_bytes:
+                        raw_lines.append(pending[:self.max_line_bytes])
+                        pending = pending[self.max_line_bytes:]
+                elif pending:
+                    raw_lines, pending = [pending], b''
+                else:
+                    break
+                lines = [raw_line.decode("utf-8", errors="replace") for raw_line in raw_lines if raw_line]
+                tail.extend(lines)
+                if log is not None and lines:
+                    log.info("\n".join(lines))
+
+    def launch(self) -> int:
+        cmd = " ".join(self.cmd)
+        if self.out_log is None:
+            print('')
+            print("cmd_wrapper commnand print: " + cmd)
+        else:
+            self.out_log.info(cmd + '\n')
+
+        new_env = self.env if self.env else os.environ.copy()
+        stdin = None if self.stdin_bytes is None else subprocess.PIPE
+        if self.shell:
+            process = subprocess.Popen(cmd,
+                                       stdin=stdin,
+                                       stdout=subprocess.PIPE,
+                                       stderr=subprocess.PIPE,
+                                       shell=True,
+                                       bufsize=self.bufsize,
+                                       executable=os.getenv('SHELL', '/bin/sh'),
+                                       env=new_env)
+        else:
+            # An absolute executable and close_fds=False let CPython spawn the process
+            # with posix_spawn instead of forking the (possibly large) Python process.
+            # Python's own descriptors are non-inheritable, so none leak to the child.
+            argv = list(self.cmd)
+            if not os.path.dirname(argv[0]):
+                argv[0] = shutil.which(argv[0]) or argv[0]
+            process = subprocess.Popen(argv,
+                                       stdin=stdin,
+                                       stdout=subprocess.PIPE,
+                                       stderr=subprocess.PIPE,
+                                       close_fds=False,
+                                       bufsize=self.bufsize,
+                                       env=new_env)
+
+        # Both pipes are drained concurrently so neither can fill up and block the process
+        readers = [threading.Thread(target=self._drain, args=(process.stdout, self.out_log, self.stdout_tail), daemon=True),
+                   threading.Thread(target=self._drain, args=(process.stderr, self.err_log, self.stderr_tail), daemon=True)]
+        for reader in readers:
+            reader.start()
+        if process.stdin:
+            try:
+                with process.stdin:
+                    process.stdin.write(self.stdin_bytes)
+            except BrokenPipeError:
+                # The process exited without reading all its input, its return code tells why
+                pass
+        process.wait()
+        for reader in readers:
+            reader.join()
+
+        if self.out_log is None:
+            print("Exit, code {}".format(process.returncode))
+        else:
+            self.out_log.info("Exit code {}".format(process.returncode) + '\n')
+
+        if self.global_log is not None:
+            self.global_log.info(fu.get_logs_prefix() + 'Executing: ' + cmd[0:80] + '...')
+            self.global_log.info(fu.get_logs_prefix() + "Exit code {}".format(process.returncode))
+
+        return process.returncode
 
 
 class GromacsVersionError(Exception):
@@ -84,6 +84,9 @@ class Editconf(BiobbObject):
             self.gmx_path += ' -nocopyright'
         if not self.container_path:
             self.gmx_version = get_gromacs_version(self.gmx_path)
+        # Built once here instead of copying os.environ on every launch
+        if self.gmx_lib:
+            self.environment = {**os.environ, 'GMXLIB': self.gmx_lib}
 
         # Check the properties
         self.check_properties(properties)
@@ -111,10 +114,6 @@ class Editconf(BiobbObject):
         fu.log("Distance of the box to molecule: %6.2f" % self.distance_to_molecule, self.out_log, self.global_log)
         fu.log("Box type: %s" % self.box_type, self.out_log, self.global_log)
 
-        if self.gmx_lib:
-            self.environment = os.environ.copy()
-            self.environment['GMXLIB'] = self.gmx_lib
-
         # Check GROMACS version
         if not self.container_path:
             if self.gmx_version < 512:
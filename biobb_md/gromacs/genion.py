@@ -97,6 +97,9 @@ class Genion(BiobbObject):
             self.gmx_path += ' -nocopyright'
         if not self.container_path:
             self.gmx_version = get_gromacs_version(self.gmx_path)
+        # Built once here instead of copying os.environ on every launch
+        if self.gmx_lib:
+            self.environment = {**os.environ, 'GMXLIB': self.gmx_lib}
 
         # Check the properties
         self.check_properties(properties)
@@ -141,10 +144,6 @@ class Genion(BiobbObject):
             self.cmd.append('-seed')
             self.cmd.append(str(self.seed))
 
-        if self.gmx_lib:
-            self.environment = os.environ.copy()
-            self.environment['GMXLIB'] = self.gmx_lib
-
         # Check GROMACS version
         if not self.container_path:
             if self.gmx_version < 512:
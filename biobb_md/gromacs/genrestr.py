@@ -84,6 +84,9 @@ class Genrestr(BiobbObject):
             self.gmx_path += ' -nocopyright'
         if not self.container_path:
             self.gmx_version = get_gromacs_version(self.gmx_path)
+        # Built once here instead of copying os.environ on every launch
+        if self.gmx_lib:
+            self.environment = {**os.environ, 'GMXLIB': self.gmx_lib}
 
         # Check the properties
         self.check_properties(properties)
@@ -107,10 +110,6 @@ class Genrestr(BiobbObject):
             self.cmd.append('-n')
             self.cmd.append(self.stage_io_dict["in"]["input_ndx_path"])
 
-        if self.gmx_lib:
-            self.environment = os.environ.copy()
-            self.environment['GMXLIB'] = self.gmx_lib
-
         # Check GROMACS version
         if not self.container_path:
             if self.gmx_version < 512:
@@ -2,13 +2,17 @@
 
 """Module containing the Select class and the command line interface."""
 import os
-import argparse
-from pathlib import Path
+from typing import List, Mapping
 from biobb_common.generic.biobb_object import BiobbObject
-from biobb_common.configuration import settings
 from biobb_common.tools import file_utils as fu
 from biobb_common.tools.file_utils import launchlogger
 from biobb_md.gromacs.common import get_gromacs_version
+from biobb_md.gromacs.common import gmx_cmd_tokens
+from biobb_md.gromacs.common import quote_container_arg
+from biobb_md.gromacs.common import stage_to_container
+from biobb_md.gromacs.common import move_to_host
+from biobb_md.gromacs.common import run_many
+from biobb_md.gromacs.common import GmxCmdWrapper
 from biobb_md.gromacs.common import GromacsVersionError
 
 
@@ -71,6 +75,8 @@ class Gmxselect(BiobbObject):
 
         # Properties specific for BB
         self.selection = properties.get('selection', "a CA C N O")
+        # Quoted once for the double-quoted container shell command line
+        self._quoted_selection = quote_container_arg(self.selection)
         self.append = properties.get('append', False)
 
         # Properties common in all GROMACS BB
@@ -78,16 +84,33 @@ class Gmxselect(BiobbObject):
         self.gmx_path = properties.get('gmx_path', 'gmx')
         self.gmx_nobackup = properties.get('gmx_nobackup', True)
         self.gmx_nocopyright = properties.get('gmx_nocopyright', True)
-        if self.gmx_nobackup:
-            self.gmx_path += ' -nobackup'
-        if self.gmx_nocopyright:
-            self.gmx_path += ' -nocopyright'
-        if not self.container_path:
-            self.gmx_version = get_gromacs_version(self.gmx_path)
+        self.gmx_cmd = gmx_cmd_tokens(self.gmx_path, self.gmx_nobackup, self.gmx_nocopyright)
+        # Detected at launch, once it is known that the step is not skipped by restart
+        self.gmx_version = None
+        # Built once here instead of copying os.environ on every launch
+        if self.gmx_lib:
+            self.environment = {**os.environ, 'GMXLIB': self.gmx_lib}
 
         # Check the properties
         self.check_properties(properties)
 
+    def stage_files(self):
+        """Stage the inputs for container runs hard linking them when possible instead of copying them."""
+        if self.container_path:
+            self.stage_io_dict = stage_to_container(self.io_dict, self.container_volume_path, self.out_log)
+        else:
+            super().stage_files()
+
+    def copy_to_host(self):
+        """Move the container outputs to the host, renaming them when possible instead of copying."""
+        if self.container_path:
+            move_to_host(self.stage_io_dict, self.io_dict)
+
+    def execute_command(self):
+        """Run gmx select. Host runs exec it without a shell, container runs go through the container shell."""
+        self.return_code = GmxCmdWrapper(self.cmd, self.out_log, self.err_log, self.global_log, self.environment,
+                                         shell=bool(self.container_path)).launch()
+
     @launchlogger
     def launch(self) -> int:
         """Execute the :class:`Gmxselect <gromacs.gmxselect.Gmxselect>` object."""
@@ -95,24 +118,21 @@ class Gmxselect(BiobbObject):
         # Setup Biobb
         if self.check_restart():
             return 0
+        if not self.container_path and self.gmx_version is None:
+            self.gmx_version = get_gromacs_version(self.gmx_path)
         self.stage_files()
 
-        self.cmd = [self.gmx_path, 'select',
+        self.cmd = [*self.gmx_cmd, 'select',
                     '-s', self.stage_io_dict["in"]["input_structure_path"],
                     '-on', self.stage_io_dict["out"]["output_ndx_path"]
                     ]
 
-        if self.stage_io_dict["in"].get("input_ndx_path") and Path(
-                self.stage_io_dict["in"].get("input_ndx_path")).exists():
-            self.cmd.append('-n')
-            self.cmd.append(self.stage_io_dict["in"].get("input_ndx_path"))
+        input_ndx_path = self.stage_io_dict["in"].get("input_ndx_path")
+        if input_ndx_path and os.path.exists(input_ndx_path):
+            self.cmd.extend(('-n', input_ndx_path))
 
-        self.cmd.append('-select')
-        self.cmd.append("\'"+self.selection+"\'")
-
-        if self.gmx_lib:
-            self.environment = os.environ.copy()
-            self.environment['GMXLIB'] = self.gmx_lib
+        # Only the container shell needs the selection quoted
+        self.cmd.extend(('-select', self._quoted_selection if self.container_path else self.selection))
 
         # Check GROMACS version
         if not self.container_path:
@@ -153,8 +173,22 @@ def gmxselect(input_structure_path: str, output_ndx_path: str,
                      properties=properties, **kwargs).launch()
 
 
+def gmxselect_many(jobs: List[Mapping], n_workers: int = None) -> List[int]:
+    """Run many independent :func:`gmxselect <gromacs.gmxselect.gmxselect>` jobs in a pool of
+    **n_workers** processes, see :func:`run_many <gromacs.common.run_many>`.
+
+    Returns:
+        list: Return codes of the jobs, in the same order.
+    """
+    return run_many(gmxselect, jobs, n_workers)
+
+
 def main():
     """Command line execution of this building block. Please check the command line documentation."""
+    # CLI-only dependencies, not needed when the building block is used as a library
+    import argparse
+    from biobb_common.configuration import settings
+
     parser = argparse.ArgumentParser(description="Wrapper for the GROMACS select module.",
                                      formatter_class=lambda prog: argparse.RawTextHelpFormatter(prog, width=99999))
     parser.add_argument('-c', '--config', required=False, help="This file can be a YAML file, JSON file or JSON string")
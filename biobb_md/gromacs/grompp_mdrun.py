@@ -1,12 +1,16 @@
 #!/usr/bin/env python3
 
 """Module containing the GromppMDrun class and the command line interface."""
+import os
 import argparse
 from pathlib import Path
+from typing import List
 from biobb_common.generic.biobb_object import BiobbObject
 from biobb_common.configuration import settings
 from biobb_common.tools import file_utils as fu
 from biobb_common.tools.file_utils import launchlogger
+from biobb_md.gromacs.common import check_complete_files
+from biobb_md.gromacs.common import mdrun_log_finished
 from biobb_md.gromacs.grompp import grompp
 from biobb_md.gromacs.mdrun import mdrun
 
@@ -20,7 +24,7 @@ class GromppMdrun(BiobbObject):
     Args:
         input_gro_path (str): Path to the input GROMACS structure GRO file. File type: input. `Sample file <https://github.com/bioexcel/biobb_md/raw/master/biobb_md/test/data/gromacs/grompp.gro>`_. Accepted formats: gro (edam:format_2033).
         input_top_zip_path (str): Path to the input GROMACS topology TOP and ITP files in zip format. File type: input. `Sample file <https://github.com/bioexcel/biobb_md/raw/master/biobb_md/test/data/gromacs/grompp.zip>`_. Accepted formats: zip (edam:format_3987).
-        output_trr_path (str): Path to the GROMACS uncompressed raw trajectory file TRR. File type: output. `Sample file <https://github.com/bioexcel/biobb_md/raw/master/biobb_md/test/reference/gromacs/ref_mdrun.trr>`_. Accepted formats: trr (edam:format_3910).
+        output_trr_path (str): Path to the GROMACS uncompressed raw trajectory file TRR. A TNG path writes a single TNG trajectory instead. File type: output. `Sample file <https://github.com/bioexcel/biobb_md/raw/master/biobb_md/test/reference/gromacs/ref_mdrun.trr>`_. Accepted formats: trr (edam:format_3910), tng (edam:format_3876).
         output_gro_path (str): Path to the output GROMACS structure GRO file. File type: output. `Sample file <https://github.com/bioexcel/biobb_md/raw/master/biobb_md/test/reference/gromacs/ref_mdrun.gro>`_. Accepted formats: gro (edam:format_2033).
         output_edr_path (str): Path to the output GROMACS portable energy file EDR. File type: output. `Sample file <https://github.com/bioexcel/biobb_md/raw/master/biobb_md/test/reference/gromacs/ref_mdrun.edr>`_. Accepted formats: edr (edam:format_2330).
         output_log_path (str): Path to the output GROMACS trajectory log file LOG. File type: output. `Sample file <https://github.com/bioexcel/biobb_md/raw/master/biobb_md/test/reference/gromacs/ref_gmx_mdrun.log>`_. Accepted formats: log (edam:format_2330).
@@ -34,22 +38,44 @@ class GromppMdrun(BiobbObject):
             * **mdp** (*dict*) - ({}) MDP options specification.
             * **simulation_type** (*str*) - ("minimization") Default options for the mdp file. Each creates a different mdp file. Values: `minimization <https://biobb-md.readthedocs.io/en/latest/_static/mdp/minimization.mdp>`_ (Energy minimization using steepest descent algorithm is used), `nvt <https://biobb-md.readthedocs.io/en/latest/_static/mdp/nvt.mdp>`_ (substance N Volume V and Temperature T are conserved), `npt <https://biobb-md.readthedocs.io/en/latest/_static/mdp/npt.mdp>`_ (substance N pressure P and Temperature T are conserved), `free <https://biobb-md.readthedocs.io/en/latest/_static/mdp/free.mdp>`_ (No design constraints applied; Free MD), `ions <https://biobb-md.readthedocs.io/en/latest/_static/mdp/minimization.mdp>`_ (Synonym of minimization), index (Creates an empty mdp file).
             * **maxwarn** (*int*) - (10) [0~1000|1] Maximum number of allowed warnings.
+            * **trajectory_format** (*str*) - ("both") Trajectory files written by mdrun, overriding the output frequencies of the mdp file unless they are also set in the mdp property. Values: trr (full precision TRR trajectory only, sets nstxout-compressed to 0), xtc (compressed XTC trajectory only, sets nstxout nstvout and nstfout to 0, output_trr_path is not created), both (trajectories requested by the mdp file).
             * **mpi_bin** (*str*) - (None) Path to the MPI runner. Usually "mpirun" or "srun".
             * **mpi_np** (*str*) - (None) Number of MPI processes. Usually an integer bigger than 1.
             * **mpi_hostlist** (*str*) - (None) Path to the MPI hostlist file.
             * **checkpoint_time** (*int*) - (15) [0~1000|1] Checkpoint writing interval in minutes. Only enabled if an output_cpt_path is provided.
+            * **continue_from_cpt** (*bool*) - (False) If output_cpt_path already exists and output_log_path shows an unfinished run (ie stopped by maxh), continue the run from it appending to the existing output files instead of starting over. Adds: -cpi output_cpt_path -append.
+            * **noconfout** (*bool*) - (False) Do not write the final structure, output_gro_path is not created. Adds: -noconfout.
+            * **resethway** (*bool*) - (False) Reset the performance counters halfway through the run, excluding load balancing warm-up from the reported performance. Adds: -resethway.
+            * **maxh** (*float*) - (None) [0-100000|0.1] Terminate the run after this many hours, writing a checkpoint. Adds: -maxh.
+            * **nstlist** (*int*) - (None) [0-1000|1] Neighbour search frequency in steps, overriding the value of the TPR. Searching less often is cheaper but needs a larger pair list buffer, which GROMACS sets automatically with the Verlet cut-off scheme. Adds: -nstlist.
             * **num_threads** (*int*) - (0) [0-1000|1] Let GROMACS guess. The number of threads that are going to be used.
             * **num_threads_mpi** (*int*) - (0) [0-1000|1] Let GROMACS guess. The number of GROMACS MPI threads that are going to be used.
             * **num_threads_omp** (*int*) - (0) [0-1000|1] Let GROMACS guess. The number of GROMACS OPENMP threads that are going to be used.
             * **num_threads_omp_pme** (*int*) - (0) [0-1000|1] Let GROMACS guess. The number of GROMACS OPENMP_PME threads that are going to be used.
-            * **use_gpu** (*bool*) - (False) Use settings appropriate for GPU. Adds: -nb gpu -pme gpu
+            * **auto_tune** (*bool*) - (False) When neither the number of threads nor mpi_bin are set, use a single thread-MPI rank with one OpenMP thread per available core, usually the fastest setup for single node runs. Adds: -ntmpi 1 -ntomp cores. Also sets (if not already defined): OMP_PLACES=cores OMP_PROC_BIND=close.
+            * **instance_index** (*int*) - (None) [0-1000|1] Index of this mdrun among several running concurrently on the same node. Used with cores_per_instance to pin each mdrun to its own set of cores.
+            * **cores_per_instance** (*int*) - (None) [0-1000|1] Number of cores assigned to each concurrent mdrun. Adds: -pin on -pinoffset instance_index*cores_per_instance -pinstride 1 -ntomp cores_per_instance.
+            * **pin** (*str*) - (None) Whether mdrun pins threads to cores. Adds: -pin. With "on" also sets (if not already defined): OMP_PLACES=cores OMP_PROC_BIND=close. Values: auto, on, off.
+            * **pin_offset** (*int*) - (None) [0-1000|1] The lowest logical core number to which mdrun should pin the first thread. Adds: -pinoffset.
+            * **pin_stride** (*int*) - (None) [0-64|1] Pinning distance in logical cores for threads, use 0 to minimize the number of threads per physical core. Adds: -pinstride.
+            * **use_gpu** (*bool*) - (False) Use settings appropriate for GPU. Adds: -nb gpu -pme gpu. Bonded interactions and update stay where GROMACS puts them, use the bonded and update properties to move them to the GPU.
             * **gpu_id** (*str*) - (None) List of unique GPU device IDs available to use.
             * **gpu_tasks** (*str*) - (None) List of GPU device IDs, mapping each PP task on each node to a device.
+            * **gpu_direct_comm** (*bool*) - (True) When use_gpu and mpi_bin are set, enable GPU direct communication between ranks. Sets (if not already defined): GMX_ENABLE_DIRECT_GPU_COMM=1 MPICH_GPU_SUPPORT_ENABLED=1
+            * **bonded** (*str*) - (None) Where to compute bonded interactions. Never set by use_gpu, gpu needs GROMACS 2020 or newer. Adds: -bonded. Values: auto, cpu, gpu.
+            * **update** (*str*) - (None) Where to perform update and constraints. Never set by use_gpu: GPU update is only supported by the md integrator. Adds: -update. Values: auto, cpu, gpu.
+            * **pme_fft** (*str*) - (None) Where to perform the PME FFT. Adds: -pmefft. Values: auto, cpu, gpu.
+            * **npme** (*int*) - (None) [0-1000|1] Number of separate ranks dedicated to PME. With use_gpu, several gpu_id devices and more than one rank explicitly set by num_threads_mpi (or mpi_np with mpi_bin) defaults to 1, so a dedicated rank runs PME on its own GPU. Left unset otherwise. Adds: -npme.
+            * **write_buffer_mb** (*int*) - (None) [0-1024|1] Size in MiB of the GROMACS file I/O buffer (GMX_LOG_BUFFER environment variable). Larger buffers mean fewer and bigger writes, 32 is a sensible value for long runs. 0 disables buffering.
+            * **md_log_buffering** (*int*) - (1048576) [0-67108864|1024] Size in bytes of the buffer used to read the mdrun output, fewer and bigger reads for runs that print a lot. The output is always read while mdrun runs, so it never blocks the simulation.
             * **gmx_lib** (*str*) - (None) Path set GROMACS GMXLIB environment variable.
             * **gmx_path** (*str*) - ("gmx") Path to the GROMACS executable binary.
             * **remove_tmp** (*bool*) - (True) [WF property] Remove temporal files.
+            * **async_cleanup** (*bool*) - (False) [WF property] Remove the temporal files in a background thread, so launch returns without waiting for the unlinks. The Python interpreter waits for the removal before exiting.
             * **restart** (*bool*) - (False) [WF property] Do not execute if output files exist.
+            * **skip_property_check** (*bool*) - (False) [WF property] Do not check the property names, for property dictionaries already validated upstream. Also enabled by the BIOBB_SKIP_CHECK environment variable.
             * **sandbox_path** (*str*) - ("./") [WF property] Parent path to the sandbox directory.
+            * **scratch_dir** (*str*) - (None) [WF property] Node-local directory (ie $TMPDIR or /dev/shm) where the TPR is copied before mdrun reads it, avoiding shared file system reads at start up. Not used with containers.
             * **container_path** (*str*) - (None)  Path to the binary executable of your container.
             * **container_image** (*str*) - ("gromacs/gromacs:latest") Container Image identifier.
             * **container_volume_path** (*str*) - ("/data") Path to an internal directory in the container.
@@ -98,7 +124,7 @@ class GromppMdrun(BiobbObject):
         super().__init__(properties)
 
         grompp_properties_keys = ['mdp', 'maxwarn', 'simulation_type']
-        mdrun_properties_keys = ['mpi_bin', 'mpi_np', 'mpi_hostlist', 'checkpoint_time', 'num_threads', 'num_threads_mpi', 'num_threads_omp', 'num_threads_omp_pme', 'use_gpu', 'gpu_id', 'gpu_tasks', 'dev']
+        mdrun_properties_keys = ['mpi_bin', 'mpi_np', 'mpi_hostlist', 'checkpoint_time', 'continue_from_cpt', 'noconfout', 'resethway', 'maxh', 'nstlist', 'num_threads', 'num_threads_mpi', 'num_threads_omp', 'num_threads_omp_pme', 'auto_tune', 'instance_index', 'cores_per_instance', 'pin', 'pin_offset', 'pin_stride', 'use_gpu', 'gpu_id', 'gpu_tasks', 'gpu_direct_comm', 'bonded', 'update', 'pme_fft', 'npme', 'write_buffer_mb', 'md_log_buffering', 'async_cleanup', 'scratch_dir', 'skip_property_check', 'dev']
         self.properties_grompp = {}
         self.properties_mdrun = {}
         if properties:
@@ -109,6 +135,18 @@ class GromppMdrun(BiobbObject):
             self.properties_mdrun = properties.copy()
             for key in grompp_properties_keys:
                 self.properties_mdrun.pop(key, None)
+            self.properties_grompp.pop('trajectory_format', None)
+            self.properties_mdrun.pop('trajectory_format', None)
+
+        # Trajectory format, applied through the output frequencies of the mdp
+        self.trajectory_format = properties.get('trajectory_format', 'both')
+        self.trajectory_mdp = {}
+        if self.trajectory_format == 'xtc' and output_xtc_path:
+            self.trajectory_mdp = {'nstxout': '0', 'nstvout': '0', 'nstfout': '0'}
+        elif self.trajectory_format == 'trr':
+            self.trajectory_mdp = {'nstxout-compressed': '0'}
+        if self.trajectory_mdp:
+            self.properties_grompp['mdp'] = {**self.trajectory_mdp, **self.properties_grompp.get('mdp', {})}
 
         # Grompp arguments
         self.input_gro_path = input_gro_path
@@ -128,10 +166,31 @@ class GromppMdrun(BiobbObject):
         self.output_cpt_path = output_cpt_path
         self.output_dhdl_path = output_dhdl_path
 
+    def _restart_outputs(self) -> List[str]:
+        """Outputs checked on restart, leaving out the ones the run deliberately does not write."""
+        output_files = [self.output_gro_path, self.output_edr_path, self.output_log_path,
+                        self.output_xtc_path, self.output_cpt_path, self.output_dhdl_path]
+        if self.properties_mdrun.get('noconfout'):
+            output_files.remove(self.output_gro_path)
+        if not (self.trajectory_format == 'xtc' and self.trajectory_mdp):
+            output_files.append(self.output_trr_path)
+        return output_files
+
     @launchlogger
     def launch(self) -> int:
         """Execute the :class:`GromppMdrun <gromacs.grompp_mdrun.GromppMdrun>` object."""
 
+        # A run stopped by -maxh is left to mdrun, to be continued from its checkpoint
+        unfinished_run = bool(self.properties_mdrun.get('continue_from_cpt') and self.output_cpt_path
+                              and os.path.isfile(self.output_cpt_path) and not mdrun_log_finished(self.output_log_path))
+        if self.restart and not unfinished_run and check_complete_files(self._restart_outputs()):
+            fu.log('Restart is enabled, this step: %s will the skipped' % self.step, self.out_log, self.global_log)
+            return 0
+
+        if self.trajectory_mdp:
+            fu.log(f'Trajectory format {self.trajectory_format}, setting mdp options: {self.trajectory_mdp}', self.out_log, self.global_log)
+        elif self.trajectory_format == 'xtc':
+            fu.log('WARNING: trajectory_format xtc needs an output_xtc_path, keeping the mdp output frequencies', self.out_log, self.global_log)
         fu.log(f'Calling Grompp class', self.out_log, self.global_log)
         grompp_return_code = grompp(input_gro_path=self.input_gro_path, input_top_zip_path=self.input_top_zip_path,
                                     output_tpr_path=self.output_tpr_path, input_cpt_path=self.input_cpt_path,
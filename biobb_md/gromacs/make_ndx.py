@@ -2,13 +2,12 @@
 
 """Module containing the MakeNdx class and the command line interface."""
 import os
-import argparse
-from pathlib import Path
 from biobb_common.generic.biobb_object import BiobbObject
-from biobb_common.configuration import settings
 from biobb_common.tools import file_utils as fu
 from biobb_common.tools.file_utils import launchlogger
 from biobb_md.gromacs.common import get_gromacs_version
+from biobb_md.gromacs.common import check_input_files
+from biobb_md.gromacs.common import move_to_host
 from biobb_md.gromacs.common import GromacsVersionError
 
 
@@ -82,10 +81,18 @@ class MakeNdx(BiobbObject):
             self.gmx_path += ' -nocopyright'
         if not self.container_path:
             self.gmx_version = get_gromacs_version(self.gmx_path)
+        # Built once here instead of copying os.environ on every launch
+        if self.gmx_lib:
+            self.environment = {**os.environ, 'GMXLIB': self.gmx_lib}
 
         # Check the properties
         fu.check_properties(self, properties)
 
+    def copy_to_host(self):
+        """Move the container outputs to the host, renaming them when possible instead of copying."""
+        if self.container_path:
+            move_to_host(self.stage_io_dict, self.io_dict)
+
     @launchlogger
     def launch(self) -> int:
         """Execute the :class:`MakeNdx <gromacs.make_ndx.MakeNdx>` object."""
@@ -93,23 +100,35 @@ class MakeNdx(BiobbObject):
         # Setup Biobb
         if self.check_restart():
             return 0
+        check_input_files(self.io_dict["in"]["input_structure_path"])
         self.stage_files()
 
+        # Write the selection to a file and redirect it to make_ndx stdin
+        # instead of shipping it through the arguments of an echo pipe
+        if self.container_path:
+            selection_dir = self.stage_io_dict["unique_dir"]
+        else:
+            selection_dir = fu.create_unique_dir()
+            self.tmp_files.append(selection_dir)
+        selection_file = os.path.join(selection_dir, 'selection.txt')
+        with open(selection_file, 'w') as sel_file:
+            sel_file.write(self.selection.replace('\\n', '\n') + '\nq\n')
+        if self.container_path:
+            selection_file = os.path.join(self.container_volume_path, 'selection.txt')
+
         # Create command line
-        self.cmd = ['echo', '-e', '\'' + self.selection + '\\nq' + '\'', '|',
-                    self.gmx_path, 'make_ndx',
+        self.cmd = [self.gmx_path, 'make_ndx',
                     '-f', self.stage_io_dict["in"]["input_structure_path"],
                     '-o', self.stage_io_dict["out"]["output_ndx_path"]
                     ]
 
         if self.stage_io_dict["in"].get("input_ndx_path")\
-                and Path(self.stage_io_dict["in"].get("input_ndx_path")).exists():
+                and os.path.exists(self.stage_io_dict["in"].get("input_ndx_path")):
             self.cmd.append('-n')
             self.cmd.append(self.stage_io_dict["in"].get("input_ndx_path"))
 
-        if self.gmx_lib:
-            self.environment = os.environ.copy()
-            self.environment['GMXLIB'] = self.gmx_lib
+        self.cmd.append('<')
+        self.cmd.append(selection_file)
 
         # Check GROMACS version
         if not self.container_path:
@@ -142,6 +161,10 @@ def make_ndx(input_structure_path: str, output_ndx_path: str,
 
 def main():
     """Command line execution of this building block. Please check the command line documentation."""
+    # CLI-only dependencies, not needed when the building block is used as a library
+    import argparse
+    from biobb_common.configuration import settings
+
     parser = argparse.ArgumentParser(description="Wrapper for the GROMACS make_ndx module.",
                                      formatter_class=lambda prog: argparse.RawTextHelpFormatter(prog, width=99999))
     parser.add_argument('-c', '--config', required=False, help="This file can be a YAML file, JSON file or JSON string")
@@ -2,12 +2,24 @@
 
 """Module containing the MDrun class and the command line interface."""
 import os
-import argparse
+import shlex
+import shutil
+import asyncio
+import functools
+import threading
+from typing import List
 from biobb_common.generic.biobb_object import BiobbObject
-from biobb_common.configuration import settings
 from biobb_common.tools import file_utils as fu
 from biobb_common.tools.file_utils import launchlogger
 from biobb_md.gromacs.common import get_gromacs_version
+from biobb_md.gromacs.common import gmx_cmd_tokens
+from biobb_md.gromacs.common import quote_container_arg
+from biobb_md.gromacs.common import check_input_files
+from biobb_md.gromacs.common import check_complete_files
+from biobb_md.gromacs.common import mdrun_log_finished
+from biobb_md.gromacs.common import fspath_io_dict
+from biobb_md.gromacs.common import move_to_host
+from biobb_md.gromacs.common import GmxCmdWrapper
 from biobb_md.gromacs.common import GromacsVersionError
 
 
@@ -19,7 +31,7 @@ class Mdrun(BiobbObject):
 
     Args:
         input_tpr_path (str): Path to the portable binary run input file TPR. File type: input. `Sample file <https://github.com/bioexcel/biobb_md/raw/master/biobb_md/test/data/gromacs/mdrun.tpr>`_. Accepted formats: tpr (edam:format_2333).
-        output_trr_path (str): Path to the GROMACS uncompressed raw trajectory file TRR. File type: output. `Sample file <https://github.com/bioexcel/biobb_md/raw/master/biobb_md/test/reference/gromacs/ref_mdrun.trr>`_. Accepted formats: trr (edam:format_3910).
+        output_trr_path (str): Path to the GROMACS uncompressed raw trajectory file TRR. A TNG path writes a single TNG trajectory instead. File type: output. `Sample file <https://github.com/bioexcel/biobb_md/raw/master/biobb_md/test/reference/gromacs/ref_mdrun.trr>`_. Accepted formats: trr (edam:format_3910), tng (edam:format_3876).
         output_gro_path (str): Path to the output GROMACS structure GRO file. File type: output. `Sample file <https://github.com/bioexcel/biobb_md/raw/master/biobb_md/test/reference/gromacs/ref_mdrun.gro>`_. Accepted formats: gro (edam:format_2033).
         output_edr_path (str): Path to the output GROMACS portable energy file EDR. File type: output. `Sample file <https://github.com/bioexcel/biobb_md/raw/master/biobb_md/test/reference/gromacs/ref_mdrun.edr>`_. Accepted formats: edr (edam:format_2330).
         output_log_path (str): Path to the output GROMACS trajectory log file LOG. File type: output. `Sample file <https://github.com/bioexcel/biobb_md/raw/master/biobb_md/test/reference/gromacs/ref_mdrun.log>`_. Accepted formats: log (edam:format_2330).
@@ -32,18 +44,39 @@ class Mdrun(BiobbObject):
             * **mpi_np** (*int*) - (0) [0~1000|1] Number of MPI processes. Usually an integer bigger than 1.
             * **mpi_flags** (*str*) - (None) Path to the MPI hostlist file.
             * **checkpoint_time** (*int*) - (15) [0~1000|1] Checkpoint writing interval in minutes. Only enabled if an output_cpt_path is provided.
+            * **continue_from_cpt** (*bool*) - (False) If output_cpt_path already exists and output_log_path shows an unfinished run (ie stopped by maxh), continue the run from it appending to the existing output files instead of starting over. Adds: -cpi output_cpt_path -append.
+            * **noconfout** (*bool*) - (False) Do not write the final structure, output_gro_path is not created. Adds: -noconfout.
+            * **resethway** (*bool*) - (False) Reset the performance counters halfway through the run, excluding load balancing warm-up from the reported performance. Adds: -resethway.
+            * **maxh** (*float*) - (None) [0~100000|0.1] Terminate the run after this many hours, writing a checkpoint. Adds: -maxh.
+            * **nstlist** (*int*) - (None) [0~1000|1] Neighbour search frequency in steps, overriding the value of the TPR. Searching less often is cheaper but needs a larger pair list buffer, which GROMACS sets automatically with the Verlet cut-off scheme. Adds: -nstlist.
             * **num_threads** (*int*) - (0) [0~1000|1] Let GROMACS guess. The number of threads that are going to be used.
             * **num_threads_mpi** (*int*) - (0) [0~1000|1] Let GROMACS guess. The number of GROMACS MPI threads that are going to be used.
             * **num_threads_omp** (*int*) - (0) [0~1000|1] Let GROMACS guess. The number of GROMACS OPENMP threads that are going to be used.
             * **num_threads_omp_pme** (*int*) - (0) [0~1000|1] Let GROMACS guess. The number of GROMACS OPENMP_PME threads that are going to be used.
-            * **use_gpu** (*bool*) - (False) Use settings appropriate for GPU. Adds: -nb gpu -pme gpu
+            * **auto_tune** (*bool*) - (False) When neither the number of threads nor mpi_bin are set, use a single thread-MPI rank with one OpenMP thread per available core, usually the fastest setup for single node runs. Adds: -ntmpi 1 -ntomp cores. Also sets (if not already defined): OMP_PLACES=cores OMP_PROC_BIND=close.
+            * **instance_index** (*int*) - (None) [0~1000|1] Index of this mdrun among several running concurrently on the same node. Used with cores_per_instance to pin each mdrun to its own set of cores.
+            * **cores_per_instance** (*int*) - (None) [0~1000|1] Number of cores assigned to each concurrent mdrun. Adds: -pin on -pinoffset instance_index*cores_per_instance -pinstride 1 -ntomp cores_per_instance.
+            * **pin** (*str*) - (None) Whether mdrun pins threads to cores. Adds: -pin. With "on" also sets (if not already defined): OMP_PLACES=cores OMP_PROC_BIND=close. Values: auto, on, off.
+            * **pin_offset** (*int*) - (None) [0~1000|1] The lowest logical core number to which mdrun should pin the first thread. Adds: -pinoffset.
+            * **pin_stride** (*int*) - (None) [0~64|1] Pinning distance in logical cores for threads, use 0 to minimize the number of threads per physical core. Adds: -pinstride.
+            * **use_gpu** (*bool*) - (False) Use settings appropriate for GPU. Adds: -nb gpu -pme gpu. Bonded interactions and update stay where GROMACS puts them, use the bonded and update properties to move them to the GPU.
             * **gpu_id** (*str*) - (None) List of unique GPU device IDs available to use.
             * **gpu_tasks** (*str*) - (None) List of GPU device IDs, mapping each PP task on each node to a device.
+            * **gpu_direct_comm** (*bool*) - (True) When use_gpu and mpi_bin are set, enable GPU direct communication between ranks. Sets (if not already defined): GMX_ENABLE_DIRECT_GPU_COMM=1 MPICH_GPU_SUPPORT_ENABLED=1
+            * **bonded** (*str*) - (None) Where to compute bonded interactions. Never set by use_gpu, gpu needs GROMACS 2020 or newer. Adds: -bonded. Values: auto, cpu, gpu.
+            * **update** (*str*) - (None) Where to perform update and constraints. Never set by use_gpu: GPU update is only supported by the md integrator. Adds: -update. Values: auto, cpu, gpu.
+            * **pme_fft** (*str*) - (None) Where to perform the PME FFT. Adds: -pmefft. Values: auto, cpu, gpu.
+            * **npme** (*int*) - (None) [0~1000|1] Number of separate ranks dedicated to PME. With use_gpu, several gpu_id devices and more than one rank explicitly set by num_threads_mpi (or mpi_np with mpi_bin) defaults to 1, so a dedicated rank runs PME on its own GPU. Left unset otherwise. Adds: -npme.
+            * **write_buffer_mb** (*int*) - (None) [0~1024|1] Size in MiB of the GROMACS file I/O buffer (GMX_LOG_BUFFER environment variable). Larger buffers mean fewer and bigger writes, 32 is a sensible value for long runs. 0 disables buffering.
+            * **md_log_buffering** (*int*) - (1048576) [0~67108864|1024] Size in bytes of the buffer used to read the mdrun output, fewer and bigger reads for runs that print a lot. The output is always read while mdrun runs, so it never blocks the simulation.
             * **gmx_lib** (*str*) - (None) Path set GROMACS GMXLIB environment variable.
             * **gmx_path** (*str*) - ("gmx") Path to the GROMACS executable binary.
             * **remove_tmp** (*bool*) - (True) [WF property] Remove temporal files.
+            * **async_cleanup** (*bool*) - (False) [WF property] Remove the temporal files in a background thread, so launch returns without waiting for the unlinks. The Python interpreter waits for the removal before exiting.
             * **restart** (*bool*) - (False) [WF property] Do not execute if output files exist.
+            * **skip_property_check** (*bool*) - (False) [WF property] Do not check the property names, for property dictionaries already validated upstream. Also enabled by the BIOBB_SKIP_CHECK environment variable.
             * **sandbox_path** (*str*) - ("./") [WF property] Parent path to the sandbox directory.
+            * **scratch_dir** (*str*) - (None) [WF property] Node-local directory (ie $TMPDIR or /dev/shm) where the TPR is copied before mdrun reads it, avoiding shared file system reads at start up. Not used with containers.
             * **container_path** (*str*) - (None)  Path to the binary executable of your container.
             * **container_image** (*str*) - (None) Container Image identifier.
             * **container_volume_path** (*str*) - ("/data") Path to an internal directory in the container.
@@ -75,6 +108,27 @@ class Mdrun(BiobbObject):
             * schema: http://edamontology.org/EDAM.owl
     """
 
+    # Optional input/output files and the mdrun option that takes them
+    _IO_FLAGS = (('in', 'input_cpt_path', '-cpi'),
+                 ('out', 'output_xtc_path', '-x'),
+                 ('out', 'output_cpt_path', '-cpo'),
+                 ('out', 'output_dhdl_path', '-dhdl'))
+    # Option giving the number of processes to each MPI runner, '-n' for the rest
+    _MPI_NP_FLAG = {'mpirun': '-np', 'mpiexec': '-n', 'srun': '-n', 'aprun': '-n', 'jsrun': '--np'}
+    # Properties passed as the value of an mdrun option when set
+    _PROP_FLAGS = (('-maxh', 'maxh', 'Run will stop after this many hours'),
+                   ('-nstlist', 'nstlist', 'Neighbour search frequency overriding the TPR'),
+                   ('-nt', 'num_threads', 'User added number of gmx threads'),
+                   ('-ntmpi', 'num_threads_mpi', 'User added number of gmx mpi threads'),
+                   ('-ntomp', 'num_threads_omp', 'User added number of gmx omp threads'),
+                   ('-ntomp_pme', 'num_threads_omp_pme', 'User added number of gmx omp_pme threads'),
+                   ('-gpu_id', 'gpu_id', 'List of unique GPU device IDs available to use'),
+                   ('-gputasks', 'gpu_tasks', 'List of GPU device IDs, mapping each PP task on each node to a device'),
+                   ('-bonded', 'bonded', 'Bonded interactions computed on'),
+                   ('-update', 'update', 'Update and constraints performed on'),
+                   ('-pmefft', 'pme_fft', 'PME FFT performed on'),
+                   ('-npme', 'npme', 'Separate PME ranks'))
+
     def __init__(self, input_tpr_path: str, output_trr_path: str, output_gro_path: str, output_edr_path: str,
                  output_log_path: str, input_cpt_path: str = None, output_xtc_path: str = None, output_cpt_path: str = None,
                  output_dhdl_path: str = None, properties: dict = None, **kwargs) -> None:
@@ -84,13 +138,13 @@ class Mdrun(BiobbObject):
         super().__init__(properties)
 
         # Input/Output files
-        self.io_dict = {
+        self.io_dict = fspath_io_dict({
             "in": {"input_tpr_path": input_tpr_path, "input_cpt_path": input_cpt_path},
             "out": {"output_trr_path": output_trr_path, "output_gro_path": output_gro_path,
                     "output_edr_path": output_edr_path, "output_log_path": output_log_path,
                     "output_xtc_path": output_xtc_path, "output_cpt_path": output_cpt_path,
                     "output_dhdl_path": output_dhdl_path}
-        }
+        })
 
         # Properties specific for BB
         # general mpi properties
@@ -102,27 +156,195 @@ class Mdrun(BiobbObject):
         self.num_threads_mpi = str(properties.get('num_threads_mpi', ''))
         self.num_threads_omp = str(properties.get('num_threads_omp', ''))
         self.num_threads_omp_pme = str(properties.get('num_threads_omp_pme', ''))
+        self.auto_tune = properties.get('auto_tune', False)
+        # concurrent mdruns on the same node
+        self.instance_index = properties.get('instance_index')
+        self.cores_per_instance = properties.get('cores_per_instance')
+        # cpu pinning
+        self.pin = properties.get('pin')
+        self.pin_offset = properties.get('pin_offset')
+        self.pin_stride = properties.get('pin_stride')
         # gromacs gpus
         self.use_gpu = properties.get('use_gpu', False)  # Adds: -nb gpu -pme gpu
         self.gpu_id = str(properties.get('gpu_id', ''))
         self.gpu_tasks = str(properties.get('gpu_tasks', ''))
+        self.gpu_direct_comm = properties.get('gpu_direct_comm', True)
+        self.bonded = properties.get('bonded')
+        self.update = properties.get('update')
+        self.pme_fft = properties.get('pme_fft')
+        self.npme = str(properties.get('npme', ''))
         # gromacs
         self.checkpoint_time = properties.get('checkpoint_time')
+        self.continue_from_cpt = properties.get('continue_from_cpt', False)
+        self.noconfout = properties.get('noconfout', False)
+        self.resethway = properties.get('resethway', False)
+        self.maxh = properties.get('maxh')
+        self.nstlist = properties.get('nstlist')
+        self.write_buffer_mb = properties.get('write_buffer_mb')
+        self.md_log_buffering = properties.get('md_log_buffering', 1024 * 1024)
+        self.async_cleanup = properties.get('async_cleanup', False)
+        self.scratch_dir = properties.get('scratch_dir')
+        self.skip_property_check = properties.get('skip_property_check', False) or bool(os.environ.get('BIOBB_SKIP_CHECK'))
 
         # Properties common in all GROMACS BB
         self.gmx_lib = properties.get('gmx_lib', None)
         self.gmx_path = properties.get('gmx_path', 'gmx')
         self.gmx_nobackup = properties.get('gmx_nobackup', True)
         self.gmx_nocopyright = properties.get('gmx_nocopyright', True)
-        if self.gmx_nobackup:
-            self.gmx_path += ' -nobackup'
-        if self.gmx_nocopyright:
-            self.gmx_path += ' -nocopyright'
-        if (not self.mpi_bin) and (not self.container_path):
-            self.gmx_version = get_gromacs_version(self.gmx_path)
+        self.gmx_cmd = gmx_cmd_tokens(self.gmx_path, self.gmx_nobackup, self.gmx_nocopyright)
+        # Detected at launch, once it is known that the step is not skipped by restart
+        self.gmx_version = None
+
+        # Check the properties, unless they were already validated upstream
+        if not self.skip_property_check:
+            self.check_properties(properties)
+
+        # dev options are tokenized once here following shell quoting rules, instead
+        # of being str.split by BiobbObject.create_cmd_line on every launch
+        self._dev_tokens = shlex.split(self.dev) if self.dev else []
+        self.dev = None
+
+        # The property dependent part of the command line and the environment are built only once
+        self._build_static_cmd()
+        self._build_environment()
+
+    def _build_static_cmd(self) -> None:
+        """Build the MPI prefix and the mdrun options that only depend on the properties."""
+        self._cmd_notes = []
+        self._mpi_cmd = []
+        self._cmd_tail = []
+        # values of the _PROP_FLAGS options, some of them derived from other properties below
+        values = {prop: getattr(self, prop) for _, prop, _ in self._PROP_FLAGS}
+
+        if self.io_dict["out"].get("output_trr_path") and self.io_dict["out"].get("output_xtc_path"):
+            self._cmd_notes.append('WARNING: both output_trr_path and output_xtc_path were requested, mdrun will write two trajectories. '
+                                   'Skip one of them, or use a TNG output_trr_path, to reduce the trajectory I/O.')
+        if self.resethway:
+            self._cmd_tail.append('-resethway')
 
-        # Check the properties
-        self.check_properties(properties)
+        # general mpi properties
+        if self.mpi_bin:
+            self._mpi_cmd = [self.mpi_bin]
+            if self.mpi_np:
+                np_flag = self._MPI_NP_FLAG.get(os.path.basename(self.mpi_bin), '-n')
+                self._cmd_notes.append(f'MPI processes: {np_flag} {self.mpi_np}')
+                self._mpi_cmd.append(np_flag)
+                self._mpi_cmd.append(str(self.mpi_np))
+            if self.mpi_flags:
+                self._mpi_cmd.extend(shlex.split(self.mpi_flags))
+
+        # gromacs cpu mpi/openmp properties
+        self._auto_tuned = bool(self.auto_tune and not (self.num_threads or self.num_threads_mpi or self.num_threads_omp)
+                                and not self.mpi_bin and not self.cores_per_instance)
+        if self._auto_tuned:
+            # 1 thread-MPI rank x all the cores as OpenMP threads is the single node sweet spot
+            cores = len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else os.cpu_count()
+            values['num_threads_mpi'], values['num_threads_omp'] = '1', str(cores)
+            self._cmd_notes.append(f'Auto tuning threads: 1 thread-MPI rank with {cores} OpenMP threads')
+        # cpu pinning
+        pin, pin_offset, pin_stride = self.pin, self.pin_offset, self.pin_stride
+        if self.instance_index is not None and self.cores_per_instance:
+            pin = 'on'
+            pin_offset = int(self.instance_index) * int(self.cores_per_instance)
+            pin_stride = 1 if pin_stride is None else pin_stride
+            self._cmd_notes.append(f'Pinning mdrun instance {self.instance_index} to {self.cores_per_instance} cores starting at core {pin_offset}')
+            values['num_threads_omp'] = values['num_threads_omp'] or self.cores_per_instance
+        if pin:
+            self._cmd_notes.append(f'Thread pinning: {pin}')
+            self._cmd_tail += ['-pin', pin]
+        if pin_offset is not None:
+            self._cmd_tail += ['-pinoffset', str(pin_offset)]
+        if pin_stride is not None:
+            self._cmd_tail += ['-pinstride', str(pin_stride)]
+        self._pin_mode = pin
+        # GMX gpu properties
+        if self.use_gpu:
+            self._cmd_notes.append('Adding GPU specific settings adds: -nb gpu -pme gpu')
+            self._cmd_tail += ["-nb", "gpu", "-pme", "gpu"]
+            # with several GPUs a dedicated PME rank overlaps PME with the PP work of the other devices
+            gpu_ids = self.gpu_id.split(',') if ',' in self.gpu_id else list(self.gpu_id)
+            # only with an explicit rank count, GROMACS may choose a single rank and then refuse -npme 1
+            ranks = int(self.mpi_np or 0) if self.mpi_bin else int(values['num_threads_mpi'] or 0)
+            if len(gpu_ids) > 1 and not values['npme'] and ranks > 1:
+                self._cmd_notes.append(f'Dedicating a PME rank on {len(gpu_ids)} GPUs with {ranks} ranks')
+                values['npme'] = '1'
+                values['pme_fft'] = values['pme_fft'] or 'gpu'
+
+        # a single pass over the option table
+        active_flags = [(flag, values[prop], description) for flag, prop, description in self._PROP_FLAGS if values[prop]]
+        self._cmd_notes.extend(f'{description}: {value}' for _, value, description in active_flags)
+        self._cmd_tail.extend(arg for flag, value, _ in active_flags for arg in (flag, str(value)))
+
+        if self._dev_tokens:
+            self._cmd_notes.append(f'Adding development options: {" ".join(self._dev_tokens)}')
+            self._cmd_tail.extend(self._dev_tokens)
+
+    def _build_environment(self) -> None:
+        """Build the mdrun environment, a copy of os.environ plus the GROMACS variables set by the properties."""
+        env_vars = {}
+        if self.gmx_lib:
+            env_vars['GMXLIB'] = self.gmx_lib
+        if self.write_buffer_mb is not None:
+            self._cmd_notes.append(f'Setting GROMACS file I/O buffer to {self.write_buffer_mb} MiB')
+            env_vars['GMX_LOG_BUFFER'] = str(int(self.write_buffer_mb) * 1024 * 1024)
+        if self._pin_mode == 'on' or self._auto_tuned:
+            # Keep the OpenMP runtime placement consistent with mdrun pinning
+            for env_var, value in (('OMP_PLACES', 'cores'), ('OMP_PROC_BIND', 'close')):
+                if env_var not in os.environ:
+                    env_vars[env_var] = value
+        if self.use_gpu and self.mpi_bin and self.gpu_direct_comm:
+            # Values already set by the user environment are respected
+            for env_var in ('GMX_ENABLE_DIRECT_GPU_COMM', 'MPICH_GPU_SUPPORT_ENABLED'):
+                if env_var not in os.environ:
+                    self._cmd_notes.append(f'Enabling GPU direct communication: {env_var}=1')
+                    env_vars[env_var] = '1'
+        if env_vars:
+            self.environment = {**os.environ, **env_vars}
+
+    def _checkpoint_to_continue(self) -> str:
+        """Host path of the checkpoint the run continues from, None if it starts from scratch.
+        -cpo always leaves a checkpoint behind, only the log tells whether that run is unfinished."""
+        output_cpt_path = self.io_dict["out"].get("output_cpt_path")
+        if self.continue_from_cpt and output_cpt_path and os.path.isfile(output_cpt_path) \
+                and not mdrun_log_finished(self.io_dict["out"]["output_log_path"]):
+            return output_cpt_path
+        return None
+
+    def _restart_outputs(self) -> List[str]:
+        """Outputs checked on restart, leaving out the ones the run deliberately does not write."""
+        output_files = dict(self.io_dict["out"])
+        if self.noconfout:
+            output_files.pop("output_gro_path", None)
+        return list(output_files.values())
+
+    def check_restart(self) -> bool:
+        """Skip the step if restart is enabled and all the outputs are already complete."""
+        if getattr(self, 'version', None):
+            fu.log(f"Executing {self.__module__} Version: {self.version}", self.out_log, self.global_log)
+        # A run stopped by -maxh leaves all its outputs written, it is continued instead of skipped
+        if self.restart and not self._checkpoint_to_continue() and check_complete_files(self._restart_outputs()):
+            fu.log('Restart is enabled, this step: %s will the skipped' % self.step, self.out_log, self.global_log)
+            return True
+        return False
+
+    def create_cmd_line(self):
+        """Quote the mdrun arguments before biobb_common joins them into the container shell command line."""
+        if self.container_path:
+            self.cmd = [quote_container_arg(arg) for arg in self.cmd]
+        super().create_cmd_line()
+
+    def copy_to_host(self):
+        """Move the container outputs to the host, renaming them when possible instead of copying."""
+        if self.container_path:
+            move_to_host(self.stage_io_dict, self.io_dict)
+
+    def execute_command(self):
+        """Run mdrun streaming its output to the logs, keeping only the last lines in memory."""
+        # Host runs exec mdrun directly, only the container command line needs a shell
+        self.return_code = GmxCmdWrapper(self.cmd, self.out_log, self.err_log, self.global_log,
+                                         self.environment, tail_lines=1024,
+                                         shell=bool(self.container_path),
+                                         bufsize=int(self.md_log_buffering)).launch()
 
     @launchlogger
     def launch(self) -> int:
@@ -131,74 +353,53 @@ class Mdrun(BiobbObject):
         # Setup Biobb
         if self.check_restart():
             return 0
+        if (not self.mpi_bin) and (not self.container_path) and self.gmx_version is None:
+            self.gmx_version = get_gromacs_version(self.gmx_path)
+        check_input_files(self.io_dict["in"]["input_tpr_path"])
         self.stage_files()
 
-        self.cmd = [self.gmx_path, 'mdrun',
+        notes = list(self._cmd_notes)
+        if self.scratch_dir and not self.container_path:
+            # mdrun reads the TPR from node-local storage instead of the shared file system
+            scratch_dir = fu.create_unique_dir(path=self.scratch_dir)
+            self.tmp_files.append(scratch_dir)
+            local_tpr_path = shutil.copy2(self.io_dict["in"]["input_tpr_path"], scratch_dir)
+            self.stage_io_dict = {**self.stage_io_dict, "in": {**self.stage_io_dict["in"], "input_tpr_path": local_tpr_path}}
+            notes.append(f'TPR staged to scratch: {local_tpr_path}')
+        self.cmd = [*self.gmx_cmd, 'mdrun',
                     '-s', self.stage_io_dict["in"]["input_tpr_path"],
                     '-o', self.stage_io_dict["out"]["output_trr_path"],
-                    '-c', self.stage_io_dict["out"]["output_gro_path"],
                     '-e', self.stage_io_dict["out"]["output_edr_path"],
                     '-g', self.stage_io_dict["out"]["output_log_path"]]
-
-        if self.stage_io_dict["in"].get("input_cpt_path"):
-            self.cmd.append('-cpi')
-            self.cmd.append(self.stage_io_dict["in"]["input_cpt_path"])
-        if self.stage_io_dict["out"].get("output_xtc_path"):
-            self.cmd.append('-x')
-            self.cmd.append(self.stage_io_dict["out"]["output_xtc_path"])
-        if self.stage_io_dict["out"].get("output_cpt_path"):
-            self.cmd.append('-cpo')
-            self.cmd.append(self.stage_io_dict["out"]["output_cpt_path"])
-            if self.checkpoint_time:
-                self.cmd.append('-cpt')
-                self.cmd.append(str(self.checkpoint_time))
-        if self.stage_io_dict["out"].get("output_dhdl_path"):
-            self.cmd.append('-dhdl')
-            self.cmd.append(self.stage_io_dict["out"]["output_dhdl_path"])
-
-        # general mpi properties
-        if self.mpi_bin:
-            mpi_cmd = [self.mpi_bin]
-            if self.mpi_np:
-                mpi_cmd.append('-n')
-                mpi_cmd.append(str(self.mpi_np))
-            if self.mpi_flags:
-                mpi_cmd.extend(self.mpi_flags)
-            self.cmd = mpi_cmd + self.cmd
-
-        # gromacs cpu mpi/openmp properties
-        if self.num_threads:
-            fu.log(f'User added number of gmx threads: {self.num_threads}', self.out_log)
-            self.cmd.append('-nt')
-            self.cmd.append(self.num_threads)
-        if self.num_threads_mpi:
-            fu.log(f'User added number of gmx mpi threads: {self.num_threads_mpi}', self.out_log)
-            self.cmd.append('-ntmpi')
-            self.cmd.append(self.num_threads_mpi)
-        if self.num_threads_omp:
-            fu.log(f'User added number of gmx omp threads: {self.num_threads_omp}', self.out_log)
-            self.cmd.append('-ntomp')
-            self.cmd.append(self.num_threads_omp)
-        if self.num_threads_omp_pme:
-            fu.log(f'User added number of gmx omp_pme threads: {self.num_threads_omp_pme}', self.out_log)
-            self.cmd.append('-ntomp_pme')
-            self.cmd.append(self.num_threads_omp_pme)
-        # GMX gpu properties
-        if self.use_gpu:
-            fu.log('Adding GPU specific settings adds: -nb gpu -pme gpu', self.out_log)
-            self.cmd += ["-nb", "gpu", "-pme", "gpu"]
-        if self.gpu_id:
-            fu.log(f'List of unique GPU device IDs available to use: {self.gpu_id}', self.out_log)
-            self.cmd.append('-gpu_id')
-            self.cmd.append(self.gpu_id)
-        if self.gpu_tasks:
-            fu.log(f'List of GPU device IDs, mapping each PP task on each node to a device: {self.gpu_tasks}', self.out_log)
-            self.cmd.append('-gputasks')
-            self.cmd.append(self.gpu_tasks)
-
-        if self.gmx_lib:
-            self.environment = os.environ.copy()
-            self.environment['GMXLIB'] = self.gmx_lib
+        if self.noconfout:
+            notes.append('Final structure will not be written: -noconfout')
+            self.cmd.append('-noconfout')
+        else:
+            self.cmd += ['-c', self.stage_io_dict["out"]["output_gro_path"]]
+
+        # optional input/output files
+        self.cmd.extend(arg for io, file_ref, flag in self._IO_FLAGS if self.stage_io_dict[io].get(file_ref)
+                        for arg in (flag, self.stage_io_dict[io][file_ref]))
+        if self._checkpoint_to_continue():
+            notes.append(f'Continuing the run from checkpoint: {self.io_dict["out"]["output_cpt_path"]}')
+            if self.container_path:
+                # -append needs the previous outputs next to the checkpoint
+                for file_path in filter(None, self.io_dict["out"].values()):
+                    if os.path.isfile(file_path):
+                        shutil.copy2(file_path, self.stage_io_dict["unique_dir"])
+            if self.stage_io_dict["in"].get("input_cpt_path"):
+                self.cmd[self.cmd.index('-cpi') + 1] = self.stage_io_dict["out"]["output_cpt_path"]
+            else:
+                self.cmd += ['-cpi', self.stage_io_dict["out"]["output_cpt_path"]]
+            self.cmd.append('-append')
+        if self.stage_io_dict["out"].get("output_cpt_path") and self.checkpoint_time:
+            self.cmd += ['-cpt', str(self.checkpoint_time)]
+
+        # general mpi properties and the rest of the options precomputed at construction
+        self.cmd = self._mpi_cmd + self.cmd + self._cmd_tail
+        # a single log write instead of one per option
+        if notes:
+            fu.log('mdrun options: ' + '; '.join(notes), self.out_log)
 
         # Check GROMACS version
         if (not self.mpi_bin) and (not self.container_path):
@@ -213,11 +414,31 @@ class Mdrun(BiobbObject):
         self.copy_to_host()
 
         # Remove temporal files
-        self.tmp_files.append(self.stage_io_dict.get("unique_dir"))
-        self.remove_tmp_files()
+        # Only existing paths reach fu.rm, avoiding a failing call per missing file
+        if self.stage_io_dict.get("unique_dir"):
+            self.tmp_files.append(self.stage_io_dict["unique_dir"])
+        self.tmp_files = [f for f in self.tmp_files if os.path.lexists(f)]
+        if self.async_cleanup and self.remove_tmp and self.tmp_files:
+            # Unlinking in the background lets the caller go on with the next step,
+            # the interpreter waits for non-daemon threads before exiting
+            fu.log('Removing temporal files in the background: %s' % str(self.tmp_files), self.out_log)
+            threading.Thread(target=fu.rm_file_list, args=(list(self.tmp_files),)).start()
+        else:
+            self.remove_tmp_files()
 
         return self.return_code
 
+    async def launch_async(self) -> int:
+        """Execute the :class:`Mdrun <gromacs.mdrun.Mdrun>` object without blocking the event loop.
+
+        The blocking :meth:`launch() <gromacs.mdrun.Mdrun.launch>` runs in the loop's default executor,
+        so several independent mdruns can overlap::
+
+            await asyncio.gather(*[md.launch_async() for md in mdruns])
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self.launch)
+
 
 def mdrun(input_tpr_path: str, output_trr_path: str, output_gro_path: str, output_edr_path: str,
           output_log_path: str, input_cpt_path: str = None, output_xtc_path: str = None, output_cpt_path: str = None,
@@ -233,10 +454,13 @@ def mdrun(input_tpr_path: str, output_trr_path: str, output_gro_path: str, outpu
                  **kwargs).launch()
 
 
-def main():
-    """Command line execution of this building block. Please check the command line documentation."""
+@functools.lru_cache(maxsize=None)
+def _build_parser():
+    """Build the command line parser once per process. argparse is imported here, as it is only needed by the CLI."""
+    import argparse
+
     parser = argparse.ArgumentParser(description="Wrapper for the GROMACS mdrun module.",
-                                     formatter_class=lambda prog: argparse.RawTextHelpFormatter(prog, width=99999))
+                                     formatter_class=functools.partial(argparse.RawTextHelpFormatter, width=99999))
     parser.add_argument('-c', '--config', required=False, help="This file can be a YAML file, JSON file or JSON string")
 
     # Specific args of each building block
@@ -250,8 +474,15 @@ def main():
     parser.add_argument('--output_xtc_path', required=False)
     parser.add_argument('--output_cpt_path', required=False)
     parser.add_argument('--output_dhdl_path', required=False)
+    return parser
+
+
+def main(argv=None):
+    """Command line execution of this building block. Please check the command line documentation."""
+    # CLI-only dependency, not needed when the building block is used as a library
+    from biobb_common.configuration import settings
 
-    args = parser.parse_args()
+    args = _build_parser().parse_args(argv)
     config = args.config if args.config else None
     properties = settings.ConfReader(config=config).get_prop_dic()
 
@@ -2,14 +2,32 @@
 
 """Module containing the Pdb2gmx class and the command line interface."""
 import os
-import argparse
+import sys
+import shutil
+import hashlib
+import tempfile
+import warnings
+from typing import List, Mapping
 from biobb_common.generic.biobb_object import BiobbObject
-from biobb_common.configuration import settings
 from biobb_common.tools import file_utils as fu
 from biobb_common.tools.file_utils import launchlogger
 from biobb_md.gromacs.common import get_gromacs_version
+from biobb_md.gromacs.common import gmx_cmd_tokens
+from biobb_md.gromacs.common import quote_container_arg
+from biobb_md.gromacs.common import zip_top
+from biobb_md.gromacs.common import rm_file_list
+from biobb_md.gromacs.common import stage_to_container
+from biobb_md.gromacs.common import move_to_host
+from biobb_md.gromacs.common import run_many
+from biobb_md.gromacs.common import GmxCmdWrapper
 from biobb_md.gromacs.common import GromacsVersionError
 
+# Water models and force fields shipped with GROMACS, frozensets for O(1) membership checks
+_WATER_TYPES = frozenset({'spc', 'spce', 'tip3p', 'tip4p', 'tip5p', 'tips3p'})
+_FORCE_FIELDS = frozenset({'gromos45a3', 'charmm27', 'gromos53a6', 'amber96', 'amber99', 'gromos43a2', 'gromos54a7',
+                           'gromos43a1', 'amberGS', 'gromos53a5', 'amber99sb', 'amber03', 'amber99sb-ildn', 'oplsaa',
+                           'amber94', 'amber99sb-star-ildn-mut'})
+
 
 class Pdb2gmx(BiobbObject):
     """
@@ -27,6 +45,8 @@ class Pdb2gmx(BiobbObject):
             * **ignh** (*bool*) - (False) Should pdb2gmx ignore the hidrogens in the original structure.
             * **his** (*str*) - (None) Histidine protonation array.
             * **merge** (*bool*) - (False) Merge all chains into a single molecule.
+            * **compression_method** (*str*) - ("deflate") Compression method of the output topology zip file. Values: deflate (Deflate compressed with a fast compression level), stored (Uncompressed).
+            * **cache_dir** (*str*) - (None) Directory where the outputs are kept keyed on the input PDB contents and the conversion properties. A later run with the same key copies them in place instead of executing pdb2gmx.
             * **gmx_lib** (*str*) - (None) Path set GROMACS GMXLIB environment variable.
             * **gmx_path** (*str*) - ("gmx") Path to the GROMACS executable binary.
             * **remove_tmp** (*bool*) - (True) [WF property] Remove temporal files.
@@ -75,26 +95,77 @@ class Pdb2gmx(BiobbObject):
         # Properties specific for BB
         self.internal_top_name = properties.get('internal_top_name', 'p2g.top')  # Excluded from documentation for simplicity
         self.internal_itp_name = properties.get('internal_itp_name', 'posre.itp')  # Excluded from documentation for simplicity
-        self.water_type = properties.get('water_type', 'spce')
-        self.force_field = properties.get('force_field', 'amber99sb-ildn')
+        # prefix and step do not change between launches, compose the internal names once
+        self._internal_top_name = fu.create_name(prefix=self.prefix, step=self.step, name=self.internal_top_name)
+        self._internal_itp_name = fu.create_name(prefix=self.prefix, step=self.step, name=self.internal_itp_name)
+        # Interned, batch runs create many instances sharing these few values
+        self.water_type = sys.intern(properties.get('water_type', 'spce'))
+        self.force_field = sys.intern(properties.get('force_field', 'amber99sb-ildn'))
         self.ignh = properties.get('ignh', False)
         self.his = properties.get('his', None)
         self.merge = properties.get('merge', False)
+        self.compression_method = properties.get('compression_method', 'deflate')
+        self.cache_dir = properties.get('cache_dir', None)
 
         # Properties common in all GROMACS BB
         self.gmx_lib = properties.get('gmx_lib', None)
         self.gmx_path = properties.get('gmx_path', 'gmx')
         self.gmx_nobackup = properties.get('gmx_nobackup', True)
         self.gmx_nocopyright = properties.get('gmx_nocopyright', True)
-        if self.gmx_nobackup:
-            self.gmx_path += ' -nobackup'
-        if self.gmx_nocopyright:
-            self.gmx_path += ' -nocopyright'
-        if not self.container_path:
-            self.gmx_version = get_gromacs_version(self.gmx_path)
+        self.gmx_path = sys.intern(self.gmx_path)
+        self.gmx_cmd = gmx_cmd_tokens(self.gmx_path, self.gmx_nobackup, self.gmx_nocopyright)
+        # Detected at launch, once it is known that the step is not skipped by restart
+        self.gmx_version = None
+        # Built once here instead of copying os.environ on every launch
+        if self.gmx_lib:
+            self.environment = {**os.environ, 'GMXLIB': self.gmx_lib}
 
         # Check the properties
         self.check_properties(properties)
+        # Only warn: custom water models and force fields can be found through GMXLIB or the working dir
+        if self.water_type not in _WATER_TYPES:
+            warnings.warn("Warning: %s is not one of the GROMACS water models: %s" % (self.water_type, ', '.join(sorted(_WATER_TYPES))))
+        if self.force_field not in _FORCE_FIELDS:
+            warnings.warn("Warning: %s is not one of the GROMACS force fields: %s" % (self.force_field, ', '.join(sorted(_FORCE_FIELDS))))
+
+    def create_cmd_line(self):
+        """Quote the pdb2gmx arguments before biobb_common joins them into the container shell command line."""
+        if self.container_path:
+            self.cmd = [arg if arg == '|' else quote_container_arg(arg) for arg in self.cmd]
+        super().create_cmd_line()
+
+    def stage_files(self):
+        """Stage the input PDB for container runs hard linking it when possible instead of copying it."""
+        if self.container_path:
+            self.stage_io_dict = stage_to_container(self.io_dict, self.container_volume_path, self.out_log)
+        else:
+            super().stage_files()
+
+    def copy_to_host(self):
+        """Move the container outputs to the host, renaming them when possible instead of copying."""
+        if self.container_path:
+            move_to_host(self.stage_io_dict, self.io_dict)
+
+    def execute_command(self):
+        """Run pdb2gmx. Host runs exec it without a shell, feeding the histidine protonation states through its stdin."""
+        stdin_bytes = (self.his + '\n').encode() if self.his and not self.container_path else None
+        self.return_code = GmxCmdWrapper(self.cmd, self.out_log, self.err_log, self.global_log, self.environment,
+                                         shell=bool(self.container_path), stdin_bytes=stdin_bytes).launch()
+
+    def remove_tmp_files(self):
+        """Remove the temporal files unlinking them directly, without a previous existence check."""
+        if self.remove_tmp:
+            rm_file_list(self.tmp_files, self.out_log)
+
+    def _cache_key(self) -> str:
+        """Hash of the input PDB contents and every property that changes the pdb2gmx outputs."""
+        key = hashlib.blake2b(digest_size=20)
+        with open(self.io_dict["in"]["input_pdb_path"], 'rb') as pdb_file:
+            for chunk in iter(lambda: pdb_file.read(1 << 20), b''):
+                key.update(chunk)
+        key.update(repr((self.water_type, self.force_field, self.ignh, self.his, self.merge, self.compression_method,
+                         self.gmx_lib, self.container_image if self.container_path else self.gmx_version)).encode())
+        return key.hexdigest()
 
     @launchlogger
     def launch(self) -> int:
@@ -103,13 +174,29 @@ class Pdb2gmx(BiobbObject):
         # Setup Biobb
         if self.check_restart():
             return 0
+        if not self.container_path and self.gmx_version is None:
+            self.gmx_version = get_gromacs_version(self.gmx_path)
+
+        # Reuse the outputs of a previous run with the same input and properties
+        if self.cache_dir:
+            cache_key = self._cache_key()
+            cached_outputs = {file_ref: os.path.join(self.cache_dir, cache_key + os.path.splitext(file_path)[1])
+                              for file_ref, file_path in self.io_dict["out"].items()}
+            if all(os.path.isfile(cached_path) for cached_path in cached_outputs.values()):
+                # Copies, not hard links: gmx truncates existing outputs in place, which would corrupt a shared inode
+                for file_ref, cached_path in cached_outputs.items():
+                    shutil.copy2(cached_path, self.io_dict["out"][file_ref])
+                fu.log('Outputs found in cache %s, pdb2gmx execution skipped' % self.cache_dir, self.out_log, self.global_log)
+                return 0
+
         self.stage_files()
 
-        internal_top_name = fu.create_name(prefix=self.prefix, step=self.step, name=self.internal_top_name)
-        internal_itp_name = fu.create_name(prefix=self.prefix, step=self.step, name=self.internal_itp_name)
+        internal_top_name = self._internal_top_name
+        internal_itp_name = self._internal_itp_name
+        self.tmp_files.extend([internal_top_name, internal_itp_name])
 
         # Create command line
-        self.cmd = [self.gmx_path, "pdb2gmx",
+        self.cmd = [*self.gmx_cmd, "pdb2gmx",
                     "-f", self.stage_io_dict["in"]["input_pdb_path"],
                     "-o", self.stage_io_dict["out"]["output_gro_path"],
                     "-p", internal_top_name,
@@ -119,16 +206,13 @@ class Pdb2gmx(BiobbObject):
 
         if self.his:
             self.cmd.append("-his")
-            self.cmd = ['echo', self.his, '|'] + self.cmd
+            if self.container_path:
+                # The container shell pipes the selection, host runs write it to stdin
+                self.cmd = ['echo', self.his, '|'] + self.cmd
         if self.ignh:
             self.cmd.append("-ignh")
         if self.merge:
-            self.cmd.append("-merge")
-            self.cmd.append("all")
-
-        if self.gmx_lib:
-            self.environment = os.environ.copy()
-            self.environment['GMXLIB'] = self.gmx_lib
+            self.cmd.extend(("-merge", "all"))
 
         # Check GROMACS version
         if not self.container_path:
@@ -143,15 +227,36 @@ class Pdb2gmx(BiobbObject):
         self.copy_to_host()
 
         if self.container_path:
-            internal_top_name = os.path.join(self.stage_io_dict.get("unique_dir"), internal_top_name)
+            unique_dir = self.stage_io_dict["unique_dir"]
+            internal_top_name = os.path.join(unique_dir, internal_top_name)
+            # The staging dir goes first, its recursive removal takes the internal top/itp with it
+            self.tmp_files.insert(0, unique_dir)
 
         # zip topology
         fu.log('Compressing topology to: %s' % self.io_dict["out"]["output_top_zip_path"], self.out_log,
                self.global_log)
-        fu.zip_top(zip_file=self.io_dict["out"]["output_top_zip_path"], top_file=internal_top_name, out_log=self.out_log)
+        zip_top(zip_file=self.io_dict["out"]["output_top_zip_path"], top_file=internal_top_name, out_log=self.out_log,
+                compression_method=self.compression_method)
+
+        # Keep the outputs for later runs with the same input and properties
+        if self.cache_dir and self.return_code == 0:
+            try:
+                os.makedirs(self.cache_dir, exist_ok=True)
+                for file_ref, cached_path in cached_outputs.items():
+                    # Unique temporary name, concurrent runs with the same key must not share it
+                    tmp_fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, prefix=os.path.basename(cached_path) + '.',
+                                                        suffix='.tmp')
+                    os.close(tmp_fd)
+                    try:
+                        shutil.copy2(self.io_dict["out"][file_ref], tmp_path)
+                        os.replace(tmp_path, cached_path)
+                    finally:
+                        if os.path.exists(tmp_path):
+                            os.remove(tmp_path)
+            except OSError as error:
+                fu.log('Outputs could not be stored in cache %s: %s' % (self.cache_dir, error), self.out_log, self.global_log)
 
         # Remove temporal files
-        self.tmp_files.extend([self.internal_top_name, self.internal_itp_name, self.stage_io_dict.get("unique_dir")])
         self.remove_tmp_files()
 
         return self.return_code
@@ -167,8 +272,22 @@ def pdb2gmx(input_pdb_path: str, output_gro_path: str, output_top_zip_path: str,
                    **kwargs).launch()
 
 
+def pdb2gmx_many(jobs: List[Mapping], n_workers: int = None) -> List[int]:
+    """Run many independent :func:`pdb2gmx <gromacs.pdb2gmx.pdb2gmx>` jobs in a pool of
+    **n_workers** processes, see :func:`run_many <gromacs.common.run_many>`.
+
+    Returns:
+        list: Return codes of the jobs, in the same order.
+    """
+    return run_many(pdb2gmx, jobs, n_workers)
+
+
 def main():
     """Command line execution of this building block. Please check the command line documentation."""
+    # CLI-only dependencies, not needed when the building block is used as a library
+    import argparse
+    from biobb_common.configuration import settings
+
     parser = argparse.ArgumentParser(description="Wrapper of the GROMACS pdb2gmx module.",
                                      formatter_class=lambda prog: argparse.RawTextHelpFormatter(prog, width=99999))
     parser.add_argument('-c', '--config', required=False, help="This file can be a YAML file, JSON file or JSON string")
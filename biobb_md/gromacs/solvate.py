@@ -10,6 +10,8 @@ from biobb_common.configuration import settings
 from biobb_common.tools import file_utils as fu
 from biobb_common.tools.file_utils import launchlogger
 from biobb_md.gromacs.common import get_gromacs_version
+from biobb_md.gromacs.common import extract_top
+from biobb_md.gromacs.common import update_top_zip
 from biobb_md.gromacs.common import GromacsVersionError
 
 
@@ -93,6 +95,9 @@ class Solvate(BiobbObject):
             self.gmx_path += ' -nocopyright'
         if not self.container_path:
             self.gmx_version = get_gromacs_version(self.gmx_path)
+        # Built once here instead of copying os.environ on every launch
+        if self.gmx_lib:
+            self.environment = {**os.environ, 'GMXLIB': self.gmx_lib}
 
         # Check the properties
         self.check_properties(properties)
@@ -106,9 +111,9 @@ class Solvate(BiobbObject):
             return 0
         self.stage_files()
 
-        # Unzip topology to topology_out
-        top_file = fu.unzip_top(zip_file=self.input_top_zip_path, out_log=self.out_log)
-        top_dir = str(Path(top_file).parent)
+        # Extract only the top file, gmx solvate edits it without reading the included itp files
+        top_dir = fu.create_unique_dir()
+        top_file = extract_top(zip_file=self.input_top_zip_path, dest_dir=top_dir, out_log=self.out_log)
 
         if self.container_path:
             shutil.copytree(top_dir, str(Path(self.stage_io_dict.get("unique_dir")).joinpath(Path(top_dir).name)))
@@ -124,10 +129,6 @@ class Solvate(BiobbObject):
             self.cmd.append("-shell")
             self.cmd.append(str(self.shell))
 
-        if self.gmx_lib:
-            self.environment = os.environ.copy()
-            self.environment['GMXLIB'] = self.gmx_lib
-
         # Check GROMACS version
         if not self.container_path:
             if self.gmx_version < 512:
@@ -146,7 +147,8 @@ class Solvate(BiobbObject):
         # zip topology
         fu.log('Compressing topology to: %s' % self.stage_io_dict["out"]["output_top_zip_path"], self.out_log,
                self.global_log)
-        fu.zip_top(zip_file=self.io_dict["out"]["output_top_zip_path"], top_file=top_file, out_log=self.out_log)
+        update_top_zip(input_zip_file=self.input_top_zip_path, output_zip_file=self.io_dict["out"]["output_top_zip_path"],
+                       top_file=top_file, out_log=self.out_log)
 
         # Remove temporal files
         self.tmp_files.extend([self.stage_io_dict.get("unique_dir"), top_dir])
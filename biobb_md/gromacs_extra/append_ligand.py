@@ -10,6 +10,11 @@ from biobb_common.configuration import settings
 from biobb_common.tools import file_utils as fu
 from biobb_common.tools.file_utils import launchlogger
 
+# Compiled once, the topology scans run them on every line
+_FORCEFIELD_RE = re.compile(r'#include.*forcefield.itp\"')
+_MOLECULES_RE = re.compile(r'\[ molecules \]')
+_MOLECULETYPE_RE = re.compile(r'\[ moleculetype \]')
+
 
 class AppendLigand(BiobbObject):
     """
@@ -84,52 +89,52 @@ class AppendLigand(BiobbObject):
             top_f.close()
         fu.rm(top_file)
 
-        forcefield_pattern = r'#include.*forcefield.itp\"'
-        if top_lines:
-            for index, line in enumerate(top_lines):
-                if re.search(forcefield_pattern, line):
-                    break
-        else:
+        if not top_lines:
             fu.log(f'FATAL: Input topfile {top_file} from input_top_zip_path {self.io_dict["in"].get("input_top_zip_path")} is empty.', self.out_log, self.global_log)
             return 1
 
-        top_lines.insert(index+1, '\n')
-        top_lines.insert(index+2, '; Including ligand ITP\n')
-        top_lines.insert(index+3, '#include "' + itp_name + '"\n')
-        top_lines.insert(index+4, '\n')
+        # Single pass: first forcefield include (last line if none) and last protein in the molecules section
+        index_forcefield = None
+        index_molecule = None
+        inside_molecules_section = False
+        for index, line in enumerate(top_lines):
+            if index_forcefield is None and _FORCEFIELD_RE.search(line):
+                index_forcefield = index
+            elif _MOLECULES_RE.search(line):
+                inside_molecules_section = True
+            elif inside_molecules_section and not line.startswith(';') and line.upper().startswith('PROTEIN'):
+                index_molecule = index
+        if index_forcefield is None:
+            index_forcefield = len(top_lines) - 1
+
+        ligand_lines = ['\n', '; Including ligand ITP\n', '#include "' + itp_name + '"\n', '\n']
         if self.io_dict['in'].get("input_posres_itp_path"):
-            top_lines.insert(index+5, '; Ligand position restraints'+'\n')
-            top_lines.insert(index+6, '#ifdef '+self.posres_name+'\n')
-            top_lines.insert(index+7, '#include "'+str(Path(self.io_dict['in'].get("input_posres_itp_path")).name)+'"\n')
-            top_lines.insert(index+8, '#endif'+'\n')
-            top_lines.insert(index+9, '\n')
+            ligand_lines += ['; Ligand position restraints'+'\n',
+                             '#ifdef '+self.posres_name+'\n',
+                             '#include "'+str(Path(self.io_dict['in'].get("input_posres_itp_path")).name)+'"\n',
+                             '#endif'+'\n',
+                             '\n']
 
         inside_moleculetype_section = False
         with open(self.io_dict['in'].get("input_itp_path")) as itp_file:
-            moleculetype_pattern = r'\[ moleculetype \]'
             for line in itp_file:
-                if re.search(moleculetype_pattern, line):
+                if _MOLECULETYPE_RE.search(line):
                     inside_moleculetype_section = True
                     continue
                 if inside_moleculetype_section and not line.startswith(';'):
                     moleculetype = line.strip().split()[0].strip()
                     break
 
-        molecules_pattern = r'\[ molecules \]'
-        inside_molecules_section = False
-        index_molecule = None
         molecule_string = moleculetype+(20-len(moleculetype))*' '+'1'+'\n'
-        for index, line in enumerate(top_lines):
-            if re.search(molecules_pattern, line):
-                inside_molecules_section = True
-                continue
-            if inside_molecules_section and not line.startswith(';') and line.upper().startswith('PROTEIN'):
-                index_molecule = index
 
-        if index_molecule:
-            top_lines.insert(index_molecule+1, molecule_string)
+        # Insert the later position first so the earlier index stays valid
+        insertions = [(index_forcefield + 1, ligand_lines)]
+        if index_molecule is not None:
+            insertions.append((index_molecule + 1, [molecule_string]))
         else:
             top_lines.append(molecule_string)
+        for index, lines in sorted(insertions, key=lambda insertion: insertion[0], reverse=True):
+            top_lines[index:index] = lines
 
         new_top = fu.create_name(path=top_dir, prefix=self.prefix, step=self.step, name='ligand.top')
 
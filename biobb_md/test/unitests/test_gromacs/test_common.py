@@ -0,0 +1,86 @@
+import os
+import zipfile
+from biobb_common.tools import test_fixtures as fx
+from biobb_md.gromacs.common import GmxCmdWrapper, zip_top, extract_top, update_top_zip
+from biobb_md.gromacs.common import rm_file_list, check_complete_files
+
+
+class TestCommon:
+    def setUp(self):
+        fx.test_setup(self, 'common')
+
+    def tearDown(self):
+        fx.test_teardown(self)
+
+    def test_gmx_cmd_wrapper_tail(self):
+        cmd = ['printf', "'one\\ntwo\\rthree\\r\\nfour'", ';', 'printf', "'err\\n'", '>&2']
+        cmd_wrapper = GmxCmdWrapper(cmd, None, None, None, None, tail_lines=2)
+        assert fx.exe_success(cmd_wrapper.launch())
+        assert list(cmd_wrapper.stdout_tail) == ['three', 'four']
+        assert list(cmd_wrapper.stderr_tail) == ['err']
+
+    def test_gmx_cmd_wrapper_long_line(self):
+        cmd_wrapper = GmxCmdWrapper(['printf', "'%0100d'", '0'], None, None, None, None, max_line_bytes=40)
+        cmd_wrapper.launch()
+        assert [len(line) for line in cmd_wrapper.stdout_tail] == [40, 40, 20]
+
+    def test_gmx_cmd_wrapper_return_code(self):
+        assert GmxCmdWrapper(['exit', '3'], None, None, None, None).launch() == 3
+        assert GmxCmdWrapper(['false'], None, None, None, None, shell=False).launch() == 1
+
+    def test_gmx_cmd_wrapper_stdin(self):
+        cmd_wrapper = GmxCmdWrapper(['cat'], None, None, None, None, shell=False, stdin_bytes=b'0 0 1\n')
+        assert fx.exe_success(cmd_wrapper.launch())
+        assert list(cmd_wrapper.stdout_tail) == ['0 0 1']
+
+    def test_zip_top(self):
+        with zipfile.ZipFile(self.paths['input_top_zip_path']) as zip_f:
+            zip_f.extractall('top')
+            members = {name: zip_f.read(name) for name in zip_f.namelist()}
+        top_file = next(os.path.join('top', name) for name in members if name.endswith('.top'))
+        for compression_method, compress_type in (('deflate', zipfile.ZIP_DEFLATED), ('stored', zipfile.ZIP_STORED)):
+            zip_top('top.zip', top_file, compression_method=compression_method)
+            with zipfile.ZipFile('top.zip') as zip_f:
+                assert {name: zip_f.read(name) for name in zip_f.namelist()} == members
+                assert all(info.compress_type == compress_type for info in zip_f.infolist())
+
+    def test_extract_top(self):
+        top_file = extract_top(self.paths['input_top_zip_path'], 'top')
+        assert os.listdir('top') == [os.path.basename(top_file)]
+        with zipfile.ZipFile(self.paths['input_top_zip_path']) as zip_f, open(top_file, 'rb') as top_f:
+            assert top_f.read() == zip_f.read(os.path.basename(top_file))
+
+    def test_update_top_zip(self):
+        top_file = extract_top(self.paths['input_top_zip_path'], 'top')
+        with open(top_file, 'a') as top_f:
+            top_f.write('SOL 10\n')
+        names = update_top_zip(self.paths['input_top_zip_path'], 'top.zip', top_file)
+        with zipfile.ZipFile(self.paths['input_top_zip_path']) as zip_in, zipfile.ZipFile('top.zip') as zip_out:
+            assert zip_out.namelist() == zip_in.namelist() == names
+            for name in names:
+                if name.endswith('.top'):
+                    assert zip_out.read(name) == zip_in.read(name) + b'SOL 10\n'
+                else:
+                    assert zip_out.read(name) == zip_in.read(name)
+
+    def test_rm_file_list(self):
+        os.makedirs(os.path.join('dir', 'sub'))
+        for file_path in ('file.txt', os.path.join('dir', 'sub', 'file.txt')):
+            with open(file_path, 'w') as file_f:
+                file_f.write('data\n')
+        file_list = ['file.txt', 'missing.txt', None, 'dir', os.path.join('file.txt', 'not_a_dir')]
+        assert rm_file_list(file_list) == ['file.txt', 'dir']
+        assert not os.path.exists('file.txt')
+        assert not os.path.exists('dir')
+
+    def test_check_complete_files(self):
+        os.makedirs('dir')
+        for file_path, content in (('a.txt', 'data\n'), (os.path.join('dir', 'b.txt'), 'data\n'), ('empty.txt', '')):
+            with open(file_path, 'w') as file_f:
+                file_f.write(content)
+        assert check_complete_files(['a.txt', os.path.join('dir', 'b.txt'), None])
+        assert check_complete_files([os.path.abspath('a.txt')])
+        assert check_complete_files([])
+        assert not check_complete_files(['a.txt', 'empty.txt'])
+        assert not check_complete_files(['a.txt', 'missing.txt'])
+        assert not check_complete_files(['dir'])
@@ -1,5 +1,6 @@
+import os
 from biobb_common.tools import test_fixtures as fx
-from biobb_md.gromacs.mdrun import mdrun
+from biobb_md.gromacs.mdrun import mdrun, Mdrun
 from biobb_md.gromacs.common import gmx_rms
 
 
@@ -19,3 +20,35 @@ class TestMdrun():
         assert fx.not_empty(self.paths['output_edr_path'])
         assert fx.not_empty(self.paths['output_log_path'])
         assert fx.exe_success(returncode)
+
+    def test_mdrun_cmd_tokens(self):
+        # echo as MPI runner prints the command line instead of running the simulation
+        properties = {**self.properties, 'dev': '-v -dlb yes', 'num_threads_omp': 2, 'maxh': 1.5,
+                      'mpi_bin': 'echo', 'mpi_np': 2, 'instance_index': 1, 'cores_per_instance': 4}
+        mdrun_obj = Mdrun(properties=properties, **self.paths)
+        assert fx.exe_success(mdrun_obj.launch())
+        assert all(isinstance(arg, str) for arg in mdrun_obj.cmd)
+        assert mdrun_obj.cmd[:5] == ['echo', '-n', '2', properties['gmx_path'], '-nobackup']
+        assert mdrun_obj.cmd[mdrun_obj.cmd.index('-pinoffset') + 1] == '4'
+        assert mdrun_obj.cmd[mdrun_obj.cmd.index('-ntomp') + 1] == '2'
+        assert mdrun_obj.cmd[mdrun_obj.cmd.index('-maxh') + 1] == '1.5'
+        assert mdrun_obj.cmd[-3:] == ['-v', '-dlb', 'yes']
+
+    def test_mdrun_restart_finished_cpt(self):
+        properties = {**self.properties, 'restart': True, 'continue_from_cpt': True}
+        paths = {**self.paths, 'output_cpt_path': os.path.abspath('output_cpt.cpt')}
+        for file_ref in ('output_trr_path', 'output_gro_path', 'output_edr_path', 'output_cpt_path'):
+            with open(paths[file_ref], 'w') as output_file:
+                output_file.write('previous run\n')
+        with open(paths['output_log_path'], 'w') as log_file:
+            log_file.write('Started mdrun on rank 0\nFinished mdrun on rank 0\n')
+        # A finished run is skipped, even though -cpo left its checkpoint behind
+        returncode = mdrun(properties=properties, **paths)
+        assert fx.exe_success(returncode)
+        with open(paths['output_trr_path']) as trr_file:
+            assert trr_file.read() == 'previous run\n'
+        # A run stopped by -maxh is continued from its checkpoint
+        with open(paths['output_log_path'], 'w') as log_file:
+            log_file.write('Started mdrun on rank 0\nStep 500: Run time exceeded 0.990 hours, will terminate the run within 100 steps\n'
+                           'Finished mdrun on rank 0\n')
+        assert not Mdrun(properties=properties, **paths).check_restart()
@@ -1,5 +1,7 @@
+import os
+import filecmp
 from biobb_common.tools import test_fixtures as fx
-from biobb_md.gromacs.pdb2gmx import pdb2gmx
+from biobb_md.gromacs.pdb2gmx import pdb2gmx, Pdb2gmx
 
 
 class TestPdb2gmx:
@@ -16,3 +18,27 @@ class TestPdb2gmx:
         assert fx.not_empty(self.paths['output_gro_path'])
         assert fx.equal(self.paths['output_gro_path'], self.paths['ref_output_gro_path'])
         assert fx.exe_success(returncode)
+
+    def test_pdb2gmx_cache_key(self):
+        key = Pdb2gmx(properties=self.properties, **self.paths)._cache_key()
+        assert key == Pdb2gmx(properties=self.properties, **self.paths)._cache_key()
+        assert key != Pdb2gmx(properties={**self.properties, 'water_type': 'tip3p'}, **self.paths)._cache_key()
+        assert key != Pdb2gmx(properties={**self.properties, 'his': None}, **self.paths)._cache_key()
+
+    def test_pdb2gmx_cache(self):
+        properties = {**self.properties, 'cache_dir': os.path.abspath('pdb2gmx_cache')}
+        # Miss: pdb2gmx runs and stores its outputs in the cache
+        returncode = pdb2gmx(properties=properties, **self.paths)
+        assert fx.exe_success(returncode)
+        cached_files = sorted(os.listdir(properties['cache_dir']))
+        assert [os.path.splitext(file_name)[1] for file_name in cached_files] == ['.gro', '.zip']
+        # Hit: the outputs are copied from the cache, tagged here to tell them from a new pdb2gmx run
+        cached_gro_path = os.path.join(properties['cache_dir'], cached_files[0])
+        with open(cached_gro_path, 'a') as cached_gro:
+            cached_gro.write('cached\n')
+        os.remove(self.paths['output_gro_path'])
+        os.remove(self.paths['output_top_zip_path'])
+        returncode = pdb2gmx(properties=properties, **self.paths)
+        assert fx.exe_success(returncode)
+        assert filecmp.cmp(self.paths['output_gro_path'], cached_gro_path, shallow=False)
+        assert fx.equal(self.paths['output_top_zip_path'], self.paths['ref_output_top_zip_path'])
@@ -1,3 +1,4 @@
+import zipfile
 from biobb_common.tools import test_fixtures as fx
 from biobb_md.gromacs_extra.append_ligand import append_ligand
 
@@ -15,3 +16,26 @@ class TestAppendLigand:
         assert fx.not_empty(self.paths['output_top_zip_path'])
         assert fx.equal(self.paths['output_top_zip_path'], self.paths['ref_output_top_zip_path'])
         assert fx.exe_success(returncode)
+
+    def test_append_ligand_scan(self):
+        top_lines = ['; Include forcefield parameters\n', '#include "amber99sb-ildn.ff/forcefield.itp"\n',
+                     '#include "amber99sb-ildn.ff/tip3p.itp"\n', '\n', '[ molecules ]\n', '; Compound        #mols\n',
+                     'Protein_chain_A     1\n', 'Protein_chain_B     1\n', 'SOL              1000\n']
+        with zipfile.ZipFile('scan.zip', 'w') as zip_f:
+            zip_f.writestr('scan.top', ''.join(top_lines))
+        with open('scan.itp', 'w') as itp_f:
+            itp_f.write('[ moleculetype ]\n; name  nrexcl\nLIG  3\n')
+        with open('posre_scan.itp', 'w') as posres_f:
+            posres_f.write('[ position_restraints ]\n')
+        returncode = append_ligand(input_top_zip_path='scan.zip', input_itp_path='scan.itp', output_top_zip_path='scan_out.zip',
+                                   input_posres_itp_path='posre_scan.itp', properties=self.properties)
+        assert fx.exe_success(returncode)
+        with zipfile.ZipFile('scan_out.zip') as zip_f:
+            top_name = next(name for name in zip_f.namelist() if name.endswith('.top'))
+            assert sorted(zip_f.namelist()) == sorted([top_name, 'scan.itp', 'posre_scan.itp'])
+            new_top_lines = zip_f.read(top_name).decode().splitlines(keepends=True)
+        # Ligand includes right after the first forcefield include, ligand molecule after the last protein
+        assert new_top_lines == (top_lines[:2] +
+                                 ['\n', '; Including ligand ITP\n', '#include "scan.itp"\n', '\n',
+                                  '; Ligand position restraints\n', '#ifdef POSRES_LIGAND\n', '#include "posre_scan.itp"\n', '#endif\n', '\n'] +
+                                 top_lines[2:8] + ['LIG                 1\n'] + top_lines[8:])